@@ -0,0 +1,75 @@
+"""Benchmark Flukso payload decoding: Jinja value templates versus native decoders.
+
+Run from the repository root with Home Assistant installed:
+
+    python benchmarks/bench_decode.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.template import Template  # noqa: E402
+
+from custom_components.flukso.decoder import (  # noqa: E402
+    DECODER_BATTERY, DECODER_DEFAULT, DECODER_GAS, DECODER_POWER_FACTOR,
+    DECODER_PROBLEM, DECODER_TEMPERATURE, DECODER_TRIGGER)
+
+MESSAGES = 20000
+
+# The value templates the integration used before the native decoders.
+CASES = [
+    ("default", """{{ value.split(",")[1] | float }}""", DECODER_DEFAULT,
+     "1700000000,1234.5,W"),
+    ("temperature", """{{ value.split(",")[1] | float | round(1) }}""",
+     DECODER_TEMPERATURE, "1700000000,21.37,C"),
+    ("battery",
+     """{{ (((value.split(",")[1] | float) / 3.3) * 100) | round(2) }}""",
+     DECODER_BATTERY, "1700000000,3.012,V"),
+    ("gas", """{{ ((value.split(",")[1] | float) / 1000) }}""", DECODER_GAS,
+     "1700000000,1234567,L"),
+    ("pf", """{{ ((value.split(",")[1] | float) * 100) | round(1) }}""",
+     DECODER_POWER_FACTOR, "1700000000,0.9731,"),
+    ("error", """
+                    {% if (value.split(",")[1]|int) > 0 %}
+                        ON
+                    {% else %}
+                        OFF
+                    {% endif %}""", DECODER_PROBLEM, "1700000000,0,"),
+    ("movement", """
+                    {% if value %}
+                        ON
+                    {% else %}
+                        OFF
+                    {% endif %}""", DECODER_TRIGGER, "1700000000"),
+]
+
+
+def _rate(func):
+    seconds = min(timeit.repeat(func, number=MESSAGES, repeat=3))
+    return MESSAGES / seconds
+
+
+async def main():
+    """Run the benchmark."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        print(f"{'type':<12}{'template msg/s':>16}{'native msg/s':>16}{'speedup':>10}")
+        for name, template_str, decoder, payload in CASES:
+            template = Template(template_str, hass)
+            template.ensure_valid()
+            render = template.async_render_with_possible_json_value
+            template_rate = _rate(lambda: render(payload))
+            native_rate = _rate(lambda: decoder.decode(payload))
+            print(
+                f"{name:<12}{template_rate:>16,.0f}{native_rate:>16,.0f}"
+                f"{native_rate / template_rate:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
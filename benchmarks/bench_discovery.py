@@ -0,0 +1,174 @@
+"""Benchmark Flukso discovery and entity generation at scale.
+
+Publishes synthetic FLM02 and FLM03 configs and TAP payloads on an in-process
+MQTT stand-in, then for every scenario reports:
+
+- setup: wall time to discover all devices concurrently with
+  async_discover_device, one subscription per device
+- fleet: wall time to discover all devices in one pass with
+  async_discover_devices, as a fleet entry does
+- build: time of get_entities_for_platform for all devices and platforms
+- schema: the part of build spent in the voluptuous MQTT platform schemas,
+  which validate every shape of entity config once per scenario
+- peak: peak traced memory while discovering and building, measured in a
+  second run
+- kept: traced memory per device still held by the discovered configs
+
+Run from the repository root with Home Assistant installed:
+
+    python benchmarks/bench_discovery.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import homeassistant.helpers.entity_platform  # noqa: E402,F401
+from homeassistant.const import Platform  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from benchmarks import synthetic  # noqa: E402
+from custom_components.flukso import descriptors, discovery  # noqa: E402
+from custom_components.flukso.const import CONF_DEVICE_HASH  # noqa: E402
+
+# (model, devices, kubes per device)
+SCENARIOS = [
+    (synthetic.MODEL_FLM02, 1, 0),
+    (synthetic.MODEL_FLM03, 1, 0),
+    (synthetic.MODEL_FLM03, 1, 10),
+    (synthetic.MODEL_FLM03, 1, 100),
+    (synthetic.MODEL_FLM03, 1, 500),
+    (synthetic.MODEL_FLM02, 10, 10),
+    (synthetic.MODEL_FLM03, 10, 10),
+    (synthetic.MODEL_FLM03, 100, 5),
+    (synthetic.MODEL_FLM03, 300, 2),
+]
+
+
+class TimedSchema:
+    """Wrap a schema, accumulating the time spent validating."""
+
+    def __init__(self, schema):
+        """Initialize the wrapper."""
+        self.schema = schema
+        self.seconds = 0.0
+
+    def __call__(self, config):
+        """Validate the config."""
+        start = time.perf_counter()
+        try:
+            return self.schema(config)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def publish_devices(hass, model, devices, kubes):
+    """Publish the retained discovery messages of the devices of a scenario."""
+    client = synthetic.async_setup_fake_mqtt(hass)
+    for device in range(devices):
+        for topic, payload in synthetic.generate_messages(device, model, kubes):
+            client.async_publish(topic, payload, retain=True)
+
+
+async def discover_fleet(hass, model, devices, kubes):
+    """Discover the devices of a scenario in one pass, returns the seconds."""
+    publish_devices(hass, model, devices, kubes)
+    start = time.perf_counter()
+    results = await discovery.async_discover_devices(hass)
+    assert len(results) == devices
+    return time.perf_counter() - start
+
+
+async def measure_kept(hass, model, devices, kubes):
+    """Return the traced bytes per device held by the discovered configs."""
+    publish_devices(hass, model, devices, kubes)
+    tracemalloc.start()
+    try:
+        results = await discovery.async_discover_devices(hass)
+        kept, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(results) == devices
+    return kept / devices
+
+
+async def discover_and_build(hass, model, devices, kubes):
+    """Discover the devices of a scenario and build their entities."""
+    publish_devices(hass, model, devices, kubes)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            synthetic.async_discover_device(hass, synthetic.device_hash(device))
+            for device in range(devices)
+        )
+    )
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    entities = 0
+    for device, result in enumerate(results):
+        entry_data = {CONF_DEVICE_HASH: synthetic.device_hash(device), **result}
+        for platform in (Platform.SENSOR, Platform.BINARY_SENSOR):
+            entities += len(
+                descriptors.get_entities_for_platform(platform, entry_data, {})
+            )
+    build = time.perf_counter() - start
+    return entities, setup, build
+
+
+async def run_scenario(config_dir, model, devices, kubes):
+    """Time a scenario, then run it again tracing the memory allocations."""
+    descriptors.VALIDATED_CONFIGS.clear()
+    sensor_schema = TimedSchema(descriptors.MQTT_SENSOR_PLATFORM_SCHEMA)
+    binary_sensor_schema = TimedSchema(descriptors.MQTT_BINARY_SENSOR_PLATFORM_SCHEMA)
+    descriptors.MQTT_SENSOR_PLATFORM_SCHEMA = sensor_schema
+    descriptors.MQTT_BINARY_SENSOR_PLATFORM_SCHEMA = binary_sensor_schema
+    try:
+        entities, setup, build = await discover_and_build(
+            HomeAssistant(config_dir), model, devices, kubes
+        )
+    finally:
+        descriptors.MQTT_SENSOR_PLATFORM_SCHEMA = sensor_schema.schema
+        descriptors.MQTT_BINARY_SENSOR_PLATFORM_SCHEMA = binary_sensor_schema.schema
+    schema = sensor_schema.seconds + binary_sensor_schema.seconds
+    fleet = await discover_fleet(HomeAssistant(config_dir), model, devices, kubes)
+
+    # Tracing slows down Python, so the memory is measured in a separate run
+    tracemalloc.start()
+    try:
+        await discover_and_build(HomeAssistant(config_dir), model, devices, kubes)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    kept = await measure_kept(HomeAssistant(config_dir), model, devices, kubes)
+
+    return entities, setup, fleet, build, schema, peak, kept
+
+
+async def main():
+    """Run the benchmark."""
+    print(
+        f"{'model':<7}{'devices':>8}{'kubes':>7}{'entities':>10}{'setup ms':>10}"
+        f"{'fleet ms':>10}{'build ms':>10}{'schema ms':>11}{'peak MiB':>10}"
+        f"{'kept KiB':>10}"
+    )
+    with tempfile.TemporaryDirectory() as config_dir:
+        for model, devices, kubes in SCENARIOS:
+            entities, setup, fleet, build, schema, peak, kept = await run_scenario(
+                config_dir, model, devices, kubes
+            )
+            print(
+                f"{model:<7}{devices:>8}{kubes:>7}{entities:>10}"
+                f"{setup * 1e3:>10.1f}{fleet * 1e3:>10.1f}{build * 1e3:>10.1f}"
+                f"{schema * 1e3:>11.1f}{peak / 2**20:>10.1f}{kept / 2**10:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
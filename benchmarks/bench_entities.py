@@ -0,0 +1,79 @@
+"""Benchmark entity config generation for large Flukso sensor configs.
+
+Generates FLM03 sensor configs with up to 1000 kubes and times
+get_entities_for_platform, and the lookup of the sensor details in the
+precomputed descriptor table versus walking the nested detail maps.
+
+Run from the repository root with Home Assistant installed:
+
+    python benchmarks/bench_entities.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import homeassistant.helpers.entity_platform  # noqa: E402,F401
+from homeassistant.const import Platform  # noqa: E402
+
+from benchmarks import synthetic  # noqa: E402
+from custom_components.flukso import descriptors, discovery  # noqa: E402
+
+KUBE_SIZES = [10, 100, 500, 1000]
+
+
+def _walk(sensors):
+    maps = (
+        descriptors.UNIT_OF_MEASUREMENT_MAP_FLM03,
+        descriptors.DEVICE_CLASS_MAP_FLM03,
+        descriptors.STATE_CLASS_MAP,
+        descriptors.ICON_MAP,
+    )
+    for sensor in sensors:
+        for detail_map in maps:
+            descriptors._get_sensor_detail(sensor, detail_map)
+
+
+def _lookup(sensors):
+    for sensor in sensors:
+        descriptors._get_sensor_descriptor(
+            descriptors._get_sensor_key(descriptors.MODEL_FLM03, sensor)
+        )
+
+
+def _time(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    """Run the benchmark."""
+    print(
+        f"{'kubes':>6}{'entities':>10}{'build ms':>10}"
+        f"{'walk us':>10}{'table us':>10}"
+    )
+    for kubes in KUBE_SIZES:
+        entry_data = synthetic.entry_data(0, synthetic.MODEL_FLM03, kubes)
+        sensors = list(entry_data[discovery.CONFTYPE_SENSOR].values())
+        # The detail maps were walked with the sensor JSON
+        sensor_jsons = [sensor.as_json() for sensor in sensors]
+
+        def build():
+            return descriptors.get_entities_for_platform(
+                Platform.SENSOR, entry_data, {}
+            ) + descriptors.get_entities_for_platform(
+                Platform.BINARY_SENSOR, entry_data, {}
+            )
+
+        entities = len(build())
+        build_time = _time(build, 3)
+        walk_time = _time(lambda: _walk(sensor_jsons), 20)
+        lookup_time = _time(lambda: _lookup(sensors), 20)
+        print(
+            f"{kubes:>6}{entities:>10}{build_time * 1e3:>10.1f}"
+            f"{walk_time * 1e6:>10.0f}{lookup_time * 1e6:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark the off delay of triggered kubes: a timer per entity versus the wheel.
+
+Every round retriggers all kubes, like movement and vibration kubes firing
+constantly, then lets the event loop run once. Reports the time per trigger
+and the number of timers on the event loop afterwards.
+
+Run from the repository root with Home Assistant installed:
+
+    python benchmarks/bench_expiry.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.event import async_call_later  # noqa: E402
+
+from custom_components.flukso.const import DEFAULT_TIMEOUT  # noqa: E402
+from custom_components.flukso.expiry import FluksoExpiryWheel  # noqa: E402
+
+KUBE_SIZES = [10, 100, 1000, 5000]
+ROUNDS = 20
+
+
+class Kube:
+    """Stand-in for a triggered binary sensor."""
+
+    _delay_listener = None
+
+    def async_expire(self):
+        """Turn off."""
+
+    def _off_delay_listener(self, now):
+        self._delay_listener = None
+
+
+def trigger_timers(hass, kubes):
+    """Reschedule the off delay timer of every kube, like MqttBinarySensor."""
+    for kube in kubes:
+        if kube._delay_listener is not None:
+            kube._delay_listener()
+        kube._delay_listener = async_call_later(
+            hass, DEFAULT_TIMEOUT, kube._off_delay_listener
+        )
+
+
+def trigger_wheel(wheel, kubes):
+    """Reschedule the off delay of every kube on the wheel."""
+    for kube in kubes:
+        wheel.async_schedule(kube, DEFAULT_TIMEOUT)
+
+
+async def run(trigger, kubes):
+    """Return the seconds per trigger and the timers left on the loop."""
+    loop = asyncio.get_running_loop()
+    seconds = 0.0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        trigger(kubes)
+        seconds += time.perf_counter() - start
+        await asyncio.sleep(0)
+    return seconds / (ROUNDS * len(kubes)), len(loop._scheduled)
+
+
+async def main():
+    """Run the benchmark."""
+    print(f"{'kubes':>6}{'timer us':>10}{'timers':>8}{'wheel us':>10}{'timers':>8}")
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        for size in KUBE_SIZES:
+            kubes = [Kube() for _ in range(size)]
+            timer, timer_handles = await run(
+                lambda kubes: trigger_timers(hass, kubes), kubes
+            )
+            for kube in kubes:
+                kube._delay_listener()
+            await asyncio.sleep(0)
+
+            wheel = FluksoExpiryWheel(hass)
+            wheel_time, wheel_handles = await run(
+                lambda kubes: trigger_wheel(wheel, kubes), kubes
+            )
+            for kube in kubes:
+                wheel.async_cancel(kube)
+            print(
+                f"{size:>6}{timer * 1e6:>10.2f}{timer_handles:>8}"
+                f"{wheel_time * 1e6:>10.2f}{wheel_handles:>8}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
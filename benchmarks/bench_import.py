@@ -0,0 +1,76 @@
+"""Benchmark the import time of the Flukso integration and its platforms.
+
+Every import is timed in a fresh interpreter that already imported what Home
+Assistant has loaded before it sets up the integration: the core and the
+MQTT integration the Flukso integration depends on. Submodules are timed on
+top of the integration package, as Home Assistant imports them. Reports the
+median import time and the number of modules the import added.
+
+Run from the repository root with Home Assistant installed:
+
+    python benchmarks/bench_import.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RUNS = 7
+PACKAGE = "custom_components.flukso"
+
+# (label, modules imported before, module timed)
+IMPORTS = [
+    ("integration (async_setup)", [], PACKAGE),
+    ("config flow", [PACKAGE], f"{PACKAGE}.config_flow"),
+    ("diagnostics", [PACKAGE], f"{PACKAGE}.diagnostics"),
+    ("sensor platform", [PACKAGE], f"{PACKAGE}.sensor"),
+    ("binary sensor platform", [PACKAGE], f"{PACKAGE}.binary_sensor"),
+]
+
+PRELOADED = [
+    "homeassistant.core",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.components.mqtt",
+]
+
+SCRIPT = """
+import importlib, json, sys, time
+for module in {preloaded!r}:
+    importlib.import_module(module)
+loaded = len(sys.modules)
+start = time.perf_counter()
+importlib.import_module({module!r})
+print(json.dumps([time.perf_counter() - start, len(sys.modules) - loaded]))
+"""
+
+
+def time_import(before, module):
+    """Return the import time in seconds and the modules added, in a fresh run."""
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            SCRIPT.format(preloaded=PRELOADED + before, module=module),
+        ],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    """Run the benchmark."""
+    print(f"{'import':<26}{'ms':>8}{'modules':>9}")
+    for label, before, module in IMPORTS:
+        results = [time_import(before, module) for _ in range(RUNS)]
+        seconds = statistics.median(result[0] for result in results)
+        modules = results[-1][1]
+        print(f"{label:<26}{seconds * 1e3:>8.1f}{modules:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Benchmark reloading the entities of a Flukso with hundreds of sensors.
+
+Adds the sensor and binary sensor entities of a synthetic FLM03 with kubes to
+Home Assistant for a config entry, then reloads them: the platforms are
+reset and new entities are added. A destructive reload also removes the
+device from the device registry in between, which takes its entity registry
+entries along, as unloading an entry used to do. Reports the reload time
+with and without removing the device, and whether an entity renamed before
+the reload kept its entity id.
+
+Run from the repository root with Home Assistant installed:
+
+    python benchmarks/bench_reload.py
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import homeassistant.helpers.entity_platform  # noqa: E402,F401
+from homeassistant import loader  # noqa: E402
+from homeassistant.config_entries import ConfigEntries, ConfigEntry  # noqa: E402
+from homeassistant.const import Platform  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import device_registry as dr  # noqa: E402
+from homeassistant.helpers import entity_registry as er  # noqa: E402
+from homeassistant.helpers.entity_platform import EntityPlatform  # noqa: E402
+
+from benchmarks import synthetic  # noqa: E402
+from custom_components.flukso.binary_sensor import \
+    FluksoBinarySensor  # noqa: E402
+from custom_components.flukso.const import (  # noqa: E402
+    DATA_DISPATCHER, DATA_EXPIRY, DATA_WATCHDOG, DOMAIN)
+from custom_components.flukso.descriptors import \
+    get_entities_for_platform  # noqa: E402
+from custom_components.flukso.dispatcher import FluksoDispatcher  # noqa: E402
+from custom_components.flukso.expiry import FluksoExpiryWheel  # noqa: E402
+from custom_components.flukso.sensor import FluksoSensor  # noqa: E402
+from custom_components.flukso.watchdog import FluksoWatchdog  # noqa: E402
+
+KUBE_SIZES = [10, 50, 100]
+RELOADS = 5
+RENAMED_ENTITY_ID = "sensor.renamed_by_user"
+
+
+def create_entities(hass, entry, entry_data):
+    """Create the entities of a Flukso by platform."""
+    return {
+        Platform.SENSOR: [
+            FluksoSensor(hass, config, entry, decoder, state_filter)
+            for config, decoder, state_filter, _ in get_entities_for_platform(
+                Platform.SENSOR, entry_data, {}
+            )
+        ],
+        Platform.BINARY_SENSOR: [
+            FluksoBinarySensor(hass, config, entry, decoder)
+            for config, decoder, _, _ in get_entities_for_platform(
+                Platform.BINARY_SENSOR, entry_data, {}
+            )
+        ],
+    }
+
+
+async def add_entities(hass, entry, entry_data):
+    """Add the entities of a Flukso, returns the platforms and entity count."""
+    platforms = []
+    count = 0
+    for domain, entities in create_entities(hass, entry, entry_data).items():
+        platform = EntityPlatform(
+            hass=hass,
+            logger=logging.getLogger(__name__),
+            domain=domain,
+            platform_name=DOMAIN,
+            platform=None,
+            scan_interval=timedelta(seconds=30),
+            entity_namespace=None,
+        )
+        platform.config_entry = entry
+        await platform.async_add_entities(entities)
+        platforms.append(platform)
+        count += len(entities)
+    return platforms, count
+
+
+async def reload(hass, entry, entry_data, platforms, remove_device):
+    """Reset the platforms and add the entities again, returns the seconds."""
+    start = time.perf_counter()
+    for platform in platforms:
+        await platform.async_reset()
+    if remove_device:
+        dev_registry = dr.async_get(hass)
+        for device in dr.async_entries_for_config_entry(
+            dev_registry, entry.entry_id
+        ):
+            dev_registry.async_remove_device(device.id)
+        await hass.async_block_till_done()
+    platforms[:], _ = await add_entities(hass, entry, entry_data)
+    await hass.async_block_till_done()
+    return time.perf_counter() - start
+
+
+async def run(config_dir, kubes, remove_device):
+    """Return the entities, median reload seconds and if the rename was kept."""
+    hass = HomeAssistant(config_dir)
+    synthetic.async_setup_fake_mqtt(hass)
+    loader.async_setup(hass)
+    await er.async_load(hass)
+    await dr.async_load(hass)
+    hass.config_entries = ConfigEntries(hass, {})
+    entry = ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title="Flukso",
+        data={},
+        source="user",
+        options={},
+        unique_id=None,
+    )
+    # Like MockConfigEntry.add_to_hass, without setting up the entry
+    hass.config_entries._entries[entry.entry_id] = entry
+    hass.data[DATA_DISPATCHER] = FluksoDispatcher(hass)
+    hass.data[DATA_EXPIRY] = FluksoExpiryWheel(hass)
+    hass.data[DATA_WATCHDOG] = FluksoWatchdog(hass)
+
+    entry_data = synthetic.entry_data(0, synthetic.MODEL_FLM03, kubes)
+    platforms, entities = await add_entities(hass, entry, entry_data)
+    entity_registry = er.async_get(hass)
+    entity_registry.async_update_entity(
+        next(iter(platforms[0].entities)), new_entity_id=RENAMED_ENTITY_ID
+    )
+
+    seconds = sorted(
+        [
+            await reload(hass, entry, entry_data, platforms, remove_device)
+            for _ in range(RELOADS)
+        ]
+    )
+    kept = entity_registry.async_get(RENAMED_ENTITY_ID) is not None
+    for platform in platforms:
+        await platform.async_reset()
+    await hass.async_stop(force=True)
+    return entities, seconds[len(seconds) // 2], kept
+
+
+async def main():
+    """Run the benchmark."""
+    # The synthetic water and gas gauges trip the sensor state class checks
+    logging.disable(logging.WARNING)
+    print(
+        f"{'kubes':>6}{'entities':>10}{'remove ms':>11}{'kept':>6}"
+        f"{'keep ms':>10}{'kept':>6}"
+    )
+    for kubes in KUBE_SIZES:
+        # Fresh registries for every run
+        with tempfile.TemporaryDirectory() as config_dir:
+            entities, destructive, destructive_kept = await run(
+                config_dir, kubes, True
+            )
+        with tempfile.TemporaryDirectory() as config_dir:
+            _, keeping, keeping_kept = await run(config_dir, kubes, False)
+        print(
+            f"{kubes:>6}{entities:>10}{destructive * 1e3:>11.1f}"
+            f"{str(destructive_kept):>6}{keeping * 1e3:>10.1f}"
+            f"{str(keeping_kept):>6}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,235 @@
+"""Replay a Flukso MQTT capture into the Flukso entities and profile the hot path.
+
+The config and TAP messages of the capture are published retained on the
+in-process MQTT stand-in, the devices are discovered and their sensor and
+binary sensor entities are added to Home Assistant. The /sensor messages are
+then replayed at real time, N times faster or as fast as possible (speed 0),
+and the per-message processing latency and event loop lag are reported. At
+high speeds the replay is a burst, and the dispatcher coalesces the messages
+of a sensor within its flush interval.
+
+Run from the repository root with Home Assistant installed:
+
+    python benchmarks/capture.py synthesize synthetic.jsonl.gz
+    python benchmarks/bench_replay.py synthetic.jsonl.gz --speed 0
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import homeassistant.helpers.entity_platform  # noqa: E402,F401
+from homeassistant import loader  # noqa: E402
+from homeassistant.const import EVENT_STATE_CHANGED, Platform  # noqa: E402
+from homeassistant.core import HomeAssistant, callback  # noqa: E402
+from homeassistant.helpers import device_registry as dr  # noqa: E402
+from homeassistant.helpers import entity_registry as er  # noqa: E402
+from homeassistant.helpers.entity_platform import EntityPlatform  # noqa: E402
+
+from benchmarks import synthetic  # noqa: E402
+from benchmarks.capture import read_capture  # noqa: E402
+from custom_components.flukso.binary_sensor import \
+    FluksoBinarySensor  # noqa: E402
+from custom_components.flukso.const import (  # noqa: E402
+    COALESCE_INTERVAL, CONF_DEVICE_HASH, DATA_DISPATCHER, DATA_EXPIRY,
+    DATA_WATCHDOG)
+from custom_components.flukso.descriptors import \
+    get_entities_for_platform  # noqa: E402
+from custom_components.flukso.dispatcher import FluksoDispatcher  # noqa: E402
+from custom_components.flukso.expiry import FluksoExpiryWheel  # noqa: E402
+from custom_components.flukso.sensor import FluksoSensor  # noqa: E402
+from custom_components.flukso.watchdog import FluksoWatchdog  # noqa: E402
+
+# Yield to the event loop every this many messages when replaying at full speed
+YIELD_EVERY = 100
+LAG_INTERVAL = 0.01
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop runs a callback scheduled at an interval."""
+
+    def __init__(self, loop, interval=LAG_INTERVAL):
+        """Initialize the monitor."""
+        self.loop = loop
+        self.interval = interval
+        self.samples = []
+        self._handle = None
+        self._expected = 0.0
+
+    def start(self):
+        """Start measuring."""
+        self._expected = self.loop.time() + self.interval
+        self._handle = self.loop.call_at(self._expected, self._tick)
+
+    def stop(self):
+        """Stop measuring."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _tick(self):
+        now = self.loop.time()
+        self.samples.append(now - self._expected)
+        self._expected = now + self.interval
+        self._handle = self.loop.call_at(self._expected, self._tick)
+
+
+def percentiles(samples):
+    """Return the p50, p90, p99, p99.9 and max of the samples."""
+    if not samples:
+        return [0.0] * 5
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return [
+        ordered[min(last, int(fraction * len(ordered)))]
+        for fraction in (0.5, 0.9, 0.99, 0.999)
+    ] + [ordered[last]]
+
+
+async def async_setup_entities(hass, messages, options):
+    """Discover the devices in the capture and add their entities."""
+    client = synthetic.async_setup_fake_mqtt(hass)
+    loader.async_setup(hass)
+    await er.async_load(hass)
+    await dr.async_load(hass)
+    hass.data[DATA_DISPATCHER] = FluksoDispatcher(hass)
+    hass.data[DATA_EXPIRY] = FluksoExpiryWheel(hass)
+    hass.data[DATA_WATCHDOG] = FluksoWatchdog(hass)
+    await hass.data[DATA_DISPATCHER].async_subscribe()
+
+    device_hashes = []
+    for _, topic, payload, _ in messages:
+        if topic.startswith("/device/"):
+            client.async_publish(topic, payload, retain=True)
+            if topic.split("/")[2] not in device_hashes:
+                device_hashes.append(topic.split("/")[2])
+
+    sensors = []
+    binary_sensors = []
+    for device_hash in device_hashes:
+        entry_data = {
+            CONF_DEVICE_HASH: device_hash,
+            **await synthetic.async_discover_device(hass, device_hash),
+        }
+        sensors.extend(
+            FluksoSensor(
+                hass, config, None, decoder, state_filter, stale_after=stale_after
+            )
+            for config, decoder, state_filter, stale_after in get_entities_for_platform(
+                Platform.SENSOR, entry_data, options
+            )
+        )
+        binary_sensors.extend(
+            FluksoBinarySensor(hass, config, None, decoder)
+            for config, decoder, _, _ in get_entities_for_platform(
+                Platform.BINARY_SENSOR, entry_data, options
+            )
+        )
+
+    for domain, entities in (
+        (Platform.SENSOR, sensors),
+        (Platform.BINARY_SENSOR, binary_sensors),
+    ):
+        platform = EntityPlatform(
+            hass=hass,
+            logger=logging.getLogger(__name__),
+            domain=domain,
+            platform_name="flukso",
+            platform=None,
+            scan_interval=timedelta(seconds=30),
+            entity_namespace=None,
+        )
+        await platform.async_add_entities(entities)
+    return client, len(device_hashes), len(sensors) + len(binary_sensors)
+
+
+async def async_replay(hass, client, messages, speed):
+    """Replay the sensor messages, returns the processing latencies."""
+    loop = hass.loop
+    latencies = []
+    publish = client.async_publish
+
+    def deliver(topic, payload):
+        start = time.perf_counter()
+        publish(topic, payload)
+        latencies.append(time.perf_counter() - start)
+
+    sensor_messages = [
+        (t, topic, payload)
+        for t, topic, payload, _ in messages
+        if topic.startswith("/sensor/")
+    ]
+    if speed == 0:
+        for index, (_, topic, payload) in enumerate(sensor_messages):
+            deliver(topic, payload)
+            if index % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+    elif sensor_messages:
+        start = loop.time()
+        for t, topic, payload in sensor_messages:
+            loop.call_at(start + t / speed, deliver, topic, payload)
+        await asyncio.sleep(sensor_messages[-1][0] / speed + 0.1)
+    return latencies
+
+
+async def main(args):
+    """Run the replay."""
+    messages = read_capture(args.path)
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        start = time.perf_counter()
+        client, devices, entities = await async_setup_entities(hass, messages, {})
+        setup = time.perf_counter() - start
+
+        state_writes = 0
+
+        @callback
+        def count_state_write(event):
+            nonlocal state_writes
+            state_writes += 1
+
+        hass.bus.async_listen(EVENT_STATE_CHANGED, count_state_write)
+        monitor = LoopLagMonitor(hass.loop)
+        monitor.start()
+        start = time.perf_counter()
+        latencies = await async_replay(hass, client, messages, args.speed)
+        duration = time.perf_counter() - start
+        monitor.stop()
+        # Let the dispatcher hand over the messages coalesced at the end
+        await asyncio.sleep(2 * COALESCE_INTERVAL)
+        await hass.async_block_till_done()
+        coalesced = hass.data[DATA_DISPATCHER].coalesced
+
+    print(
+        f"{devices} devices, {entities} entities set up in {setup * 1e3:.1f} ms\n"
+        f"{len(latencies)} messages replayed in {duration:.2f} s "
+        f"({len(latencies) / duration:,.0f} msg/s), {coalesced} coalesced, "
+        f"{state_writes} state changes"
+    )
+    print(f"{'':<20}{'p50':>10}{'p90':>10}{'p99':>10}{'p99.9':>10}{'max':>10}")
+    for name, samples in (
+        ("processing us", latencies),
+        ("loop lag us", monitor.samples),
+    ):
+        print(
+            f"{name:<20}"
+            + "".join(f"{value * 1e6:>10.1f}" for value in percentiles(samples))
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="capture file")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="replay speed, 1 is real time, 0 is as fast as possible",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,171 @@
+"""Record Flukso MQTT traffic into a capture file, or synthesize one.
+
+A capture is a gzipped JSON lines file. The first line is a header, every
+other line one message: [seconds since the start, topic, payload, retain].
+
+Record /sensor/+/+, config and TAP traffic from a broker bridged to a Flukso:
+
+    python benchmarks/capture.py record flukso.jsonl.gz --host 192.168.1.10 \\
+        --seconds 600
+
+Synthesize the traffic of FLM03 devices with kubes:
+
+    python benchmarks/capture.py synthesize synthetic.jsonl.gz --devices 2 \\
+        --kubes 10 --seconds 300
+
+Replay a capture with benchmarks/bench_replay.py.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks import synthetic  # noqa: E402
+
+CAPTURE_FORMAT = "flukso-capture"
+CAPTURE_VERSION = 1
+RECORD_TOPICS = ["/sensor/+/+", "/device/+/config/+", "/device/+/test/tap"]
+
+# Seconds between the messages of a synthesized sensor
+GAUGE_INTERVAL = 1
+COUNTER_INTERVAL = 60
+KUBE_INTERVAL = 30
+
+
+def write_capture(path, messages):
+    """Write (time, topic, payload, retain) messages to a capture file."""
+    with gzip.open(path, "wt", encoding="utf-8") as capture:
+        header = {"format": CAPTURE_FORMAT, "version": CAPTURE_VERSION}
+        capture.write(json.dumps(header) + "\n")
+        for message in messages:
+            capture.write(json.dumps(message, separators=(",", ":")) + "\n")
+
+
+def read_capture(path):
+    """Read the (time, topic, payload, retain) messages of a capture file."""
+    with gzip.open(path, "rt", encoding="utf-8") as capture:
+        header = json.loads(capture.readline())
+        if header.get("format") != CAPTURE_FORMAT:
+            raise ValueError(f"{path} is not a Flukso capture")
+        if header.get("version") != CAPTURE_VERSION:
+            raise ValueError(f"unsupported capture version {header.get('version')}")
+        return [tuple(json.loads(line)) for line in capture]
+
+
+def record(path, host, port, username, password, seconds):
+    """Record the Flukso traffic on a broker for a number of seconds."""
+    # Only needed for recording, the MQTT integration depends on it
+    import paho.mqtt.client as mqtt  # pylint: disable=import-outside-toplevel
+
+    messages = []
+    start = time.monotonic()
+
+    def on_connect(client, userdata, flags, result):
+        for topic in RECORD_TOPICS:
+            client.subscribe(topic)
+
+    def on_message(client, userdata, msg):
+        messages.append(
+            (
+                round(time.monotonic() - start, 4),
+                msg.topic,
+                msg.payload.decode("utf-8", errors="replace"),
+                bool(msg.retain),
+            )
+        )
+
+    client = mqtt.Client()
+    if username:
+        client.username_pw_set(username, password)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(host, port)
+    client.loop_start()
+    try:
+        time.sleep(seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+    write_capture(path, messages)
+    print(f"Recorded {len(messages)} messages in {time.monotonic() - start:.0f} s")
+
+
+def synthesize_messages(devices, kubes, seconds, seed=0):
+    """Generate the traffic of synthetic FLM03 devices, sorted by time."""
+    rnd = random.Random(seed)
+    messages = []
+    for device in range(devices):
+        for topic, payload in synthetic.generate_messages(
+            device, synthetic.MODEL_FLM03, kubes
+        ):
+            messages.append((0.0, topic, payload, True))
+
+        configs = synthetic.generate_configs(device, synthetic.MODEL_FLM03, kubes)
+        for sensor in configs["sensor"].values():
+            phase = rnd.random()
+            if sensor["class"] == "kube":
+                interval = KUBE_INTERVAL
+            elif sensor["data_type"] == "gauge":
+                interval = GAUGE_INTERVAL
+            else:
+                interval = COUNTER_INTERVAL
+            data_types = [sensor["data_type"]]
+            if sensor["type"] in ("electricity", "water", "gas") and (
+                sensor["data_type"] == "counter"
+            ):
+                # Counters also publish a derived gauge every second
+                data_types.append("gauge")
+            for data_type in data_types:
+                step = interval if data_type == sensor["data_type"] else GAUGE_INTERVAL
+                value = 1000.0
+                t = phase * step
+                while t < seconds:
+                    value += rnd.random() * 10
+                    topic = f'/sensor/{sensor["id"]}/{data_type}'
+                    payload = f"{1700000000 + int(t)},{value:.3f},W"
+                    messages.append((round(t, 4), topic, payload, False))
+                    t += step
+    messages.sort(key=lambda message: message[0])
+    return messages
+
+
+def main():
+    """Record or synthesize a capture."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="record from a broker")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--host", default="localhost")
+    record_parser.add_argument("--port", type=int, default=1883)
+    record_parser.add_argument("--username")
+    record_parser.add_argument("--password")
+    record_parser.add_argument("--seconds", type=float, default=300)
+
+    synthesize_parser = commands.add_parser("synthesize", help="synthesize traffic")
+    synthesize_parser.add_argument("path")
+    synthesize_parser.add_argument("--devices", type=int, default=1)
+    synthesize_parser.add_argument("--kubes", type=int, default=10)
+    synthesize_parser.add_argument("--seconds", type=float, default=300)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(
+            args.path, args.host, args.port, args.username, args.password, args.seconds
+        )
+    else:
+        messages = synthesize_messages(args.devices, args.kubes, args.seconds)
+        write_capture(args.path, messages)
+        print(f"Synthesized {len(messages)} messages")
+
+
+if __name__ == "__main__":
+    main()
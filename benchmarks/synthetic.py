@@ -0,0 +1,237 @@
+"""Synthetic Flukso configs and an in-process MQTT stand-in for the benchmarks.
+
+The configs mimic what FLM02 and FLM03 devices publish on
+/device/<hash>/config/{sensor,kube,flx} and /device/<hash>/test/tap. The
+fake client replaces the MQTT client of Home Assistant's MQTT integration,
+so code using mqtt.async_subscribe and the subscription helpers runs
+unchanged without a broker.
+"""
+import json
+import time
+
+from homeassistant.components.mqtt.models import (DATA_MQTT, MqttData,
+                                                  ReceiveMessage)
+from homeassistant.core import callback
+
+from custom_components.flukso.discovery import (FluksoDiscoveryError,
+                                                async_discover_devices,
+                                                parse_discovery)
+
+MODEL_FLM02 = "FLM02"
+MODEL_FLM03 = "FLM03"
+
+ELECTRICITY_PORTS = 3
+FLM03_SUBTYPES = [
+    ("pplus", "counter"),
+    ("pminus", "counter"),
+    ("q1", "counter"),
+    ("q2", "counter"),
+    ("q3", "counter"),
+    ("q4", "counter"),
+    ("pf", "gauge"),
+    ("vrms", "gauge"),
+    ("irms", "gauge"),
+    ("vthd", "gauge"),
+    ("ithd", "gauge"),
+    ("alpha", "gauge"),
+]
+KUBE_SENSORS = [
+    ("temperature", "gauge"),
+    ("humidity", "gauge"),
+    ("light", "gauge"),
+    ("pressure", "gauge"),
+    ("battery", "gauge"),
+    ("movement", "counter"),
+    ("vibration", "counter"),
+    ("error", "gauge"),
+]
+
+
+def device_hash(device):
+    """Return the hash of the synthetic device with the given index."""
+    return f"{device:08x}" + "d" * 24
+
+
+def generate_configs(device, model=MODEL_FLM03, kubes=0):
+    """Generate the sensor, kube and flx configs of a synthetic device."""
+    sensors = {}
+
+    def add(sensor):
+        sensor["id"] = f"{device:08x}{len(sensors):024x}"
+        sensor["enable"] = 1
+        sensors[str(len(sensors) + 1)] = sensor
+
+    for port in range(1, ELECTRICITY_PORTS + 1):
+        if model == MODEL_FLM03:
+            for subtype, data_type in FLM03_SUBTYPES:
+                add(
+                    {
+                        "class": "analog",
+                        "type": "electricity",
+                        "subtype": subtype,
+                        "data_type": data_type,
+                        "port": [port],
+                    }
+                )
+        else:
+            add(
+                {
+                    "class": "analog",
+                    "type": "electricity",
+                    "data_type": "counter",
+                    "port": [port],
+                }
+            )
+    add({"class": "pulse", "type": "water", "data_type": "counter", "port": [4]})
+    add(
+        {
+            "class": "pulse",
+            "type": "gas",
+            "data_type": "counter",
+            "port": [5],
+            "function": "gas meter",
+        }
+    )
+    for kid in range(1, kubes + 1):
+        for sensor_type, data_type in KUBE_SENSORS:
+            add(
+                {
+                    "class": "kube",
+                    "type": sensor_type,
+                    "data_type": data_type,
+                    "kid": kid,
+                }
+            )
+
+    return {
+        "sensor": sensors,
+        "kube": {str(kid): {"name": f"kube {kid}"} for kid in range(1, kubes + 1)},
+        "flx": {
+            str(port): {"name": f"port {port}"}
+            for port in range(1, ELECTRICITY_PORTS + 1)
+        },
+    }
+
+
+def generate_tap(device):
+    """Generate the TAP payload an FLM03 publishes."""
+    return f"# serial: FL03{device:06d}\n# firmware: 3.0.0\n"
+
+
+def generate_messages(device, model=MODEL_FLM03, kubes=0):
+    """Return the retained (topic, payload) discovery messages of a device."""
+    prefix = f"/device/{device_hash(device)}"
+    messages = [
+        (f"{prefix}/config/{conftype}", json.dumps(config))
+        for conftype, config in generate_configs(device, model, kubes).items()
+    ]
+    if model == MODEL_FLM03:
+        messages.append((f"{prefix}/test/tap", generate_tap(device)))
+    return messages
+
+
+def entry_data(device, model=MODEL_FLM03, kubes=0):
+    """Return the entry data of a discovered synthetic device."""
+    data = parse_discovery(generate_configs(device, model, kubes))
+    data["device_hash"] = device_hash(device)
+    data["is_flm03"] = model == MODEL_FLM03
+    if model == MODEL_FLM03:
+        data["device_serial"] = f"FL03{device:06d}"
+        data["device_firmware"] = "3.0.0"
+    return data
+
+
+async def async_discover_device(hass, discovery_hash, durations=None):
+    """Discover one device with its own subscriptions, as entries used to."""
+    discoveries = await async_discover_devices(hass, discovery_hash, durations)
+    if discovery_hash not in discoveries:
+        raise FluksoDiscoveryError(f"Flukso {discovery_hash} was not discovered")
+    return discoveries[discovery_hash]
+
+
+def topic_matches(subscription, topic):
+    """Return True if an MQTT topic matches a subscription with wildcards."""
+    sub_levels = subscription.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(sub_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level not in ("+", topic_levels[index]):
+            return False
+    return len(sub_levels) == len(topic_levels)
+
+
+class FakeMqttClient:
+    """Stand-in for the MQTT client, routing published messages in-process.
+
+    Retained messages are delivered to new subscriptions on the next loop
+    iteration, like a broker would.
+    """
+
+    connected = True
+
+    def __init__(self, hass):
+        """Initialize the client."""
+        self.hass = hass
+        self.retained = {}
+        self.subscriptions = []
+
+    def _retained_matches(self, topic):
+        """Return the retained (topic, payload) pairs matching a subscription."""
+        if "+" not in topic and "#" not in topic:
+            if topic in self.retained:
+                return [(topic, self.retained[topic])]
+            return []
+        return [
+            (retained_topic, payload)
+            for retained_topic, payload in self.retained.items()
+            if topic_matches(topic, retained_topic)
+        ]
+
+    @callback
+    def async_subscribe(
+        self, topic, msg_callback, qos=0, encoding="utf-8", job_type=None
+    ):
+        """Subscribe to a topic, returns the callback to unsubscribe."""
+        subscription = (topic, msg_callback, qos)
+        self.subscriptions.append(subscription)
+        for retained_topic, payload in self._retained_matches(topic):
+            self.hass.loop.call_soon(
+                self._deliver, subscription, retained_topic, payload, True
+            )
+
+        @callback
+        def async_unsubscribe():
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+
+        return async_unsubscribe
+
+    @callback
+    def async_publish(self, topic, payload, retain=False):
+        """Publish a message to the matching subscriptions."""
+        if retain:
+            self.retained[topic] = payload
+        for subscription in list(self.subscriptions):
+            if topic_matches(subscription[0], topic):
+                self._deliver(subscription, topic, payload, retain)
+
+    @callback
+    def _deliver(self, subscription, topic, payload, retain):
+        if subscription not in self.subscriptions:
+            return
+        subscribed_topic, msg_callback, qos = subscription
+        msg_callback(
+            ReceiveMessage(
+                topic, payload, qos, retain, subscribed_topic, time.monotonic()
+            )
+        )
+
+
+def async_setup_fake_mqtt(hass):
+    """Install the fake MQTT client in the MQTT integration data, returns it."""
+    client = FakeMqttClient(hass)
+    hass.data[DATA_MQTT] = MqttData(client=client, config=[])
+    return client
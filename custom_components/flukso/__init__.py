@@ -1,53 +1,364 @@
 """The Flukso integration."""
 from __future__ import annotations
 
+import logging
+from datetime import timedelta
+
+import voluptuous as vol
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import (HomeAssistant, ServiceCall, ServiceResponse,
+                                SupportsResponse, callback)
+from homeassistant.exceptions import (ConfigEntryNotReady,
+                                      ServiceValidationError)
 from homeassistant.helpers.typing import ConfigType
-from homeassistant.const import Platform
+from homeassistant.const import ATTR_ENTITY_ID, Platform
+from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (ATTR_END, ATTR_RESOLUTION, ATTR_START,
+                    CONF_DEVICE_FIRMWARE, CONF_DEVICE_HASH,
+                    CONF_DEVICE_SERIAL, CONF_FLM03, CONFIG_UPDATE_COOLDOWN,
+                    DATA_DEVICES, DATA_DISPATCHER, DATA_EXPIRY, DATA_HISTORY,
+                    DATA_STATS, DATA_WATCHDOG, DEFAULT_HISTORY_RESOLUTION,
+                    DOMAIN, SERVICE_GET_HISTORY, SIGNAL_CONFIG_UPDATED,
+                    STORAGE_KEY, STORAGE_SAVE_DELAY, STORAGE_VERSION)
+from .discovery import (CONFTYPE_SENSOR, CONFTYPES, FluksoDiscoveryError,
+                        async_discover_devices, async_subscribe_config_updates,
+                        dump_discovery, parse_discovery)
+from .dispatcher import FluksoDispatcher
+from .expiry import FluksoExpiryWheel
+from .stats import FluksoStats
+from .watchdog import FluksoWatchdog
 
-from .const import CONF_DEVICE_HASH, DOMAIN
-from .discovery import async_discover_device
+_LOGGER = logging.getLogger(__name__)
 
 PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.BINARY_SENSOR]
 
+DEVICE_KEYS = (CONF_DEVICE_SERIAL, CONF_DEVICE_FIRMWARE, CONF_FLM03)
+
+GET_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_RESOLUTION, default=DEFAULT_HISTORY_RESOLUTION): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+    }
+)
+
+
+class FluksoDiscoveryStore(Store):
+    """Store caching the discovered configs of the Flukso devices of an entry."""
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Initialize the store."""
+        super().__init__(hass, STORAGE_VERSION, f"{STORAGE_KEY}.{entry.entry_id}")
+        self._device_hash = entry.data.get(CONF_DEVICE_HASH)
+
+    async def _async_migrate_func(
+        self, old_major_version: int, old_minor_version: int, old_data: dict
+    ) -> dict:
+        """Key the configs cached by version 1 by the hash of their Flukso."""
+        return {self._device_hash: old_data}
+
+
+def _get_discovery_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    """Return the store caching the discovered configs of the Flukso devices."""
+    return FluksoDiscoveryStore(hass, entry)
+
+
+def _get_discovery_hash(entry: ConfigEntry) -> str:
+    """Return the device hash to discover, the + wildcard for a fleet."""
+    return entry.data.get(CONF_DEVICE_HASH, "+")
+
+
+def _get_discovery_data(devices: dict) -> dict:
+    """Return the JSON of the configs and device info of the devices by hash."""
+    return {
+        device_hash: dump_discovery(
+            {
+                key: device_data[key]
+                for key in (*CONFTYPES, *DEVICE_KEYS)
+                if key in device_data
+            }
+        )
+        for device_hash, device_data in devices.items()
+    }
+
+
+async def _async_refresh_discovery(
+    hass: HomeAssistant, entry: ConfigEntry, store: Store, cached: dict
+) -> None:
+    """Check the live Flukso device info against the cache, reload when it changed.
+
+    A fleet also reloads when a Flukso joined. Changes of the kube, flx and
+    sensor configs are picked up by the config update subscription.
+    """
+    devices = hass.data[DOMAIN][entry.entry_id]
+    durations = {}
+    try:
+        discovered = await async_discover_devices(
+            hass, _get_discovery_hash(entry), durations
+        )
+    except FluksoDiscoveryError as err:
+        _LOGGER.warning("Keeping cached config for %s: %s", entry.title, err)
+        return
+
+    changed = False
+    for device_hash, discovery in discovered.items():
+        if device_hash in devices:
+            devices[device_hash][DATA_STATS].discovery.update(durations)
+        cached_device = cached.get(device_hash)
+        if cached_device is None:
+            if device_hash not in _get_own_entry_hashes(hass):
+                _LOGGER.info("Found new Flukso %s", device_hash)
+                changed = True
+            continue
+
+        if not discovery[CONF_FLM03]:
+            # A missed TAP message does not turn an FLM03 into an FLM02
+            for key in DEVICE_KEYS:
+                if key in cached_device:
+                    discovery[key] = cached_device[key]
+
+        if any(discovery.get(key) != cached_device.get(key) for key in DEVICE_KEYS):
+            _LOGGER.info("Device info of Flukso %s changed", device_hash)
+            changed = True
+
+    if not changed:
+        _LOGGER.debug("Cached device info of %s is up to date", entry.title)
+        return
+
+    _LOGGER.info("Reloading %s", entry.title)
+    await store.async_save(_get_discovery_data({**cached, **discovered}))
+    hass.config_entries.async_schedule_reload(entry.entry_id)
+
+
+async def _async_subscribe_config_updates(
+    hass: HomeAssistant, entry: ConfigEntry, store: Store
+) -> None:
+    """Keep the entry data in sync with the configs the Flukso devices republish.
+
+    Changed configs are cached and, once the Flukso is done publishing, the
+    platforms are signalled to reconcile their entities. When a new Flukso
+    publishes its configs to a fleet, the fleet is discovered again and
+    reloaded.
+    """
+    devices = hass.data[DOMAIN][entry.entry_id]
+    new_devices: set[str] = set()
+
+    async def async_add_devices() -> None:
+        try:
+            discovered = await async_discover_devices(hass)
+        except FluksoDiscoveryError as err:
+            _LOGGER.warning("Could not discover the new Flukso devices: %s", err)
+            return
+        await store.async_save(_get_discovery_data({**discovered, **devices}))
+        hass.config_entries.async_schedule_reload(entry.entry_id)
+
+    @callback
+    def async_signal_config_updated() -> None:
+        if new_devices:
+            _LOGGER.info("Flukso %s joined %s", ", ".join(new_devices), entry.title)
+            new_devices.clear()
+            entry.async_create_background_task(
+                hass, async_add_devices(), f"flukso discovery {entry.title}"
+            )
+            return
+        async_dispatcher_send(hass, SIGNAL_CONFIG_UPDATED.format(entry.entry_id))
+
+    debouncer = Debouncer(
+        hass,
+        _LOGGER,
+        cooldown=CONFIG_UPDATE_COOLDOWN,
+        immediate=False,
+        function=async_signal_config_updated,
+    )
+
+    @callback
+    def config_received(device_hash: str, conftype: str, config: dict) -> None:
+        device_data = devices.get(device_hash)
+        if device_data is None:
+            if (
+                conftype == CONFTYPE_SENSOR
+                and device_hash not in _get_own_entry_hashes(hass)
+            ):
+                new_devices.add(device_hash)
+                debouncer.async_schedule_call()
+            return
+        if device_data.get(conftype) == config:
+            return
+        _LOGGER.info("%s config of Flukso %s changed", conftype, device_hash)
+        device_data[conftype] = config
+        store.async_delay_save(
+            lambda: _get_discovery_data(devices), STORAGE_SAVE_DELAY
+        )
+        debouncer.async_schedule_call()
+
+    entry.async_on_unload(
+        await async_subscribe_config_updates(
+            hass, _get_discovery_hash(entry), config_received
+        )
+    )
+    entry.async_on_unload(debouncer.async_shutdown)
+
+
+@callback
+def _get_own_entry_hashes(hass: HomeAssistant) -> set[str]:
+    """Return the hashes of the Flukso devices with a config entry of their own.
+
+    Entries count whether they are loaded or not, so a fleet never takes a
+    Flukso whose own entry is still setting up, retrying or disabled.
+    """
+    return {
+        entry.data[CONF_DEVICE_HASH]
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if CONF_DEVICE_HASH in entry.data
+    }
+
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up Flukso integration."""
     hass.data[DOMAIN] = {}
+    hass.data[DATA_DEVICES] = {}
+    hass.data[DATA_DISPATCHER] = FluksoDispatcher(hass)
+    hass.data[DATA_EXPIRY] = FluksoExpiryWheel(hass)
+    hass.data[DATA_WATCHDOG] = FluksoWatchdog(hass)
+    hass.data[DATA_HISTORY] = {}
+
+    async def async_get_history(call: ServiceCall) -> ServiceResponse:
+        """Return the downsampled history of a gauge as compact arrays."""
+        entity_id = call.data[ATTR_ENTITY_ID]
+        history = hass.data[DATA_HISTORY].get(entity_id)
+        if history is None:
+            raise ServiceValidationError(f"{entity_id} keeps no Flukso history")
+        # Naive times, as sent by the datetime selector, are in the time zone
+        # of Home Assistant
+        end = dt_util.as_utc(call.data.get(ATTR_END, dt_util.utcnow()))
+        start = dt_util.as_utc(
+            call.data.get(ATTR_START, end - timedelta(seconds=history.size))
+        )
+        timestamps, means, minimums, maximums = history.window(
+            int(dt_util.as_timestamp(start)),
+            int(dt_util.as_timestamp(end)),
+            call.data[ATTR_RESOLUTION],
+        )
+        return {
+            "timestamps": timestamps,
+            "mean": [round(value, 3) for value in means],
+            "min": [round(value, 3) for value in minimums],
+            "max": [round(value, 3) for value in maximums],
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_HISTORY,
+        async_get_history,
+        schema=GET_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Set up Flukso from a config entry."""
-    for _, data in hass.data[DOMAIN].items():
-        if entry.data[CONF_DEVICE_HASH] == data[CONF_DEVICE_HASH]:
-            return False
+    """Set up Flukso from a config entry.
 
-    hass.data[DOMAIN][entry.entry_id] = {
-        CONF_DEVICE_HASH: entry.data[CONF_DEVICE_HASH]
-    }
+    A fleet entry sets up every Flukso on the broker that has no entry of
+    its own, from one discovery pass and sharing its subscriptions.
+    """
+    device_hash = entry.data.get(CONF_DEVICE_HASH)
+    fleet_entry_id = hass.data[DATA_DEVICES].get(device_hash)
+    if fleet_entry_id is not None and fleet_entry_id != entry.entry_id:
+        # The Flukso got an entry of its own while the fleet had set it up
+        _LOGGER.info("Moving Flukso %s out of the fleet", device_hash)
+        await hass.config_entries.async_reload(fleet_entry_id)
+
+    devices = {}
+    hass.data[DOMAIN][entry.entry_id] = devices
 
-    await async_discover_device(hass, entry)
+    store = _get_discovery_store(hass, entry)
+    cached = await store.async_load()
+    durations = {}
+    if cached is None:
+        try:
+            discovered = await async_discover_devices(
+                hass, _get_discovery_hash(entry), durations
+            )
+        except FluksoDiscoveryError as err:
+            hass.data[DOMAIN].pop(entry.entry_id)
+            raise ConfigEntryNotReady(str(err)) from err
+        await store.async_save(_get_discovery_data(discovered))
+    else:
+        cached = {
+            device_hash: parse_discovery(discovery)
+            for device_hash, discovery in cached.items()
+        }
+        discovered = cached
+        entry.async_create_background_task(
+            hass,
+            _async_refresh_discovery(hass, entry, store, cached),
+            f"flukso discovery {entry.title}",
+        )
+
+    own_entry_hashes = (
+        set() if CONF_DEVICE_HASH in entry.data else _get_own_entry_hashes(hass)
+    )
+    for device_hash, discovery in discovered.items():
+        if device_hash in own_entry_hashes:
+            _LOGGER.debug("Flukso %s is set up by its own entry", device_hash)
+            continue
+        stats = FluksoStats()
+        stats.discovery.update(durations)
+        devices[device_hash] = {
+            CONF_DEVICE_HASH: device_hash,
+            DATA_STATS: stats,
+            **discovery,
+        }
+        hass.data[DATA_DEVICES][device_hash] = entry.entry_id
+
+    await hass.data[DATA_DISPATCHER].async_subscribe()
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    await _async_subscribe_config_updates(hass, entry, store)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the Flukso config entry when its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Unload a Flukso config entry."""
+    """Unload a Flukso config entry.
+
+    The devices and entities stay in the registries, with their
+    customizations, so a reload only adds the entities again.
+    """
+    devices = hass.data[DOMAIN].get(entry.entry_id, {})
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
+        for device_hash in devices:
+            hass.data[DATA_DEVICES].pop(device_hash, None)
+        if not hass.data[DOMAIN]:
+            hass.data[DATA_DISPATCHER].async_unsubscribe()
 
-    dev_registry = dr.async_get(hass)
-    device = dev_registry.async_get_device(
-        identifiers={
-            (DOMAIN, entry.data[CONF_DEVICE_HASH])
-        }
-    )
+    return unload_ok
 
-    if device is not None:
-        dev_registry.async_remove_device(device.id)
 
-    return unload_ok
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the devices and the cached discovery of a deleted Flukso config entry."""
+    dev_registry = dr.async_get(hass)
+    for device in dr.async_entries_for_config_entry(dev_registry, entry.entry_id):
+        if device.config_entries == {entry.entry_id}:
+            dev_registry.async_remove_device(device.id)
+        else:
+            dev_registry.async_update_device(
+                device.id, remove_config_entry_id=entry.entry_id
+            )
+    await _get_discovery_store(hass, entry).async_remove()
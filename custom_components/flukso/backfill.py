@@ -0,0 +1,237 @@
+"""Backfill Flukso counter history into the long-term statistics."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+
+import aiohttp
+from homeassistant.components.mqtt import async_subscribe_connection_status
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import (StatisticData,
+                                                      StatisticMetaData)
+from homeassistant.components.recorder.statistics import (
+    async_import_statistics, get_last_statistics)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT, CONF_HOST, Platform
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .const import (BACKFILL_DELAY, BACKFILL_MAX_GAP, CONF_DEVICE_HASH,
+                    DEFAULT_TIMEOUT, DOMAIN, FLUKSO_HTTP_PORT)
+from .discovery import CONFTYPE_SENSOR
+from .models import FluksoSensorConfig
+
+_LOGGER = logging.getLogger(__name__)
+
+# Unit of the readings asked from the Flukso API per sensor type
+READING_UNITS = {
+    "electricity": "watt",
+    "water": "lperday",
+    "gas": "lperday",
+}
+# Subtypes of FLM03 electricity sensors the readings are active power for
+READING_SUBTYPES = (None, "pplus", "pminus")
+
+
+def _get_url(host: str, sensor_id: str) -> str:
+    if ":" not in host:
+        host = f"{host}:{FLUKSO_HTTP_PORT}"
+    return f"http://{host}/sensor/{sensor_id}"
+
+
+async def async_fetch_readings(
+    session: aiohttp.ClientSession, host: str, sensor_id: str, unit: str
+) -> list[tuple[int, float]]:
+    """Fetch the (timestamp, value) readings of the last day of a sensor."""
+    async with session.get(
+        _get_url(host, sensor_id),
+        params={"version": "1.0", "interval": "day", "unit": unit},
+        headers={"Accept": "application/json", "X-Version": "1.0"},
+        timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT),
+    ) as response:
+        response.raise_for_status()
+        readings = await response.json(content_type=None)
+    return sorted(
+        (int(timestamp), float(value))
+        for timestamp, value in readings
+        if value not in (None, "nan")
+    )
+
+
+def _get_hourly_weights(
+    readings: list[tuple[int, float]], start: float, end: float
+) -> dict[float, float]:
+    """Weigh the hours between start and end by the readings that fall in them.
+
+    A reading is the average rate since the previous reading. When there are
+    no usable readings, the hours are weighted by their length.
+    """
+    weights: dict[float, float] = {}
+    for (previous, _), (timestamp, value) in zip(readings, readings[1:]):
+        if start <= previous < end:
+            hour = previous - previous % 3600
+            weights[hour] = weights.get(hour, 0.0) + value * (timestamp - previous)
+    if sum(weights.values()) <= 0:
+        weights = {}
+        hour = start - start % 3600
+        while hour < end:
+            weights[hour] = min(hour + 3600, end) - max(hour, start)
+            hour += 3600
+    return weights
+
+
+async def _async_backfill_entity(
+    hass: HomeAssistant,
+    session: aiohttp.ClientSession,
+    host: str,
+    entity_id: str,
+    sensor: FluksoSensorConfig,
+) -> int:
+    """Import the missing hours of a counter entity, return the hours imported."""
+    state = hass.states.get(entity_id)
+    try:
+        counter = float(state.state)
+    except (AttributeError, ValueError):
+        _LOGGER.debug("No counter value of %s to backfill up to", entity_id)
+        return 0
+
+    last = await get_instance(hass).async_add_executor_job(
+        get_last_statistics, hass, 1, entity_id, True, {"state", "sum"}
+    )
+    if not last.get(entity_id):
+        return 0
+    last_row = last[entity_id][0]
+    start = last_row["end"]
+    now = dt_util.utcnow().timestamp()
+    current_hour = now - now % 3600
+    if start >= current_hour:
+        return 0
+    if now - start > BACKFILL_MAX_GAP:
+        _LOGGER.info("Gap of %s too long to backfill from the Flukso", entity_id)
+        return 0
+    increase = counter - (last_row["state"] or 0.0)
+    if increase < 0:
+        _LOGGER.debug("Counter %s was reset, not backfilling", entity_id)
+        return 0
+
+    readings = await async_fetch_readings(
+        session, host, sensor.id, READING_UNITS[sensor.type]
+    )
+    # The part in the current hour is compiled by the recorder from the states
+    weights = _get_hourly_weights(readings, start, now)
+    total = sum(weights.values())
+    counter_state = last_row["state"] or 0.0
+    counter_sum = last_row["sum"] or 0.0
+    statistics = []
+    for hour in sorted(weights):
+        if hour >= current_hour:
+            break
+        hour_increase = increase * weights[hour] / total
+        counter_state += hour_increase
+        counter_sum += hour_increase
+        statistics.append(
+            StatisticData(
+                start=datetime.fromtimestamp(hour, dt_util.UTC),
+                state=counter_state,
+                sum=counter_sum,
+            )
+        )
+    if statistics:
+        async_import_statistics(
+            hass,
+            StatisticMetaData(
+                has_mean=False,
+                has_sum=True,
+                name=None,
+                source="recorder",
+                statistic_id=entity_id,
+                unit_of_measurement=state.attributes.get(ATTR_UNIT_OF_MEASUREMENT),
+            ),
+            statistics,
+        )
+    return len(statistics)
+
+
+async def async_backfill(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Backfill the statistics of the counters of a Flukso after a gap."""
+    entry_data = hass.data[DOMAIN][entry.entry_id][entry.data[CONF_DEVICE_HASH]]
+    host = entry.options[CONF_HOST]
+    sensors = {
+        sensor.id: sensor
+        for sensor in entry_data.get(CONFTYPE_SENSOR, {}).values()
+        if sensor.type in READING_UNITS and sensor.subtype in READING_SUBTYPES
+    }
+    counters = {}
+    for registry_entry in er.async_entries_for_config_entry(
+        er.async_get(hass), entry.entry_id
+    ):
+        if registry_entry.domain != Platform.SENSOR or registry_entry.disabled:
+            continue
+        _, sensor_id, data_type = registry_entry.unique_id.split("_", 2)
+        if data_type == "counter" and sensor_id in sensors:
+            counters[registry_entry.entity_id] = sensors[sensor_id]
+
+    session = async_get_clientsession(hass)
+    results = await asyncio.gather(
+        *(
+            _async_backfill_entity(hass, session, host, entity_id, sensor)
+            for entity_id, sensor in counters.items()
+        ),
+        return_exceptions=True,
+    )
+    for entity_id, result in zip(counters, results):
+        if isinstance(result, (aiohttp.ClientError, TimeoutError, ValueError)):
+            _LOGGER.warning(
+                "Could not backfill %s from %s: %s", entity_id, host, result
+            )
+        elif isinstance(result, BaseException):
+            raise result
+        elif result:
+            _LOGGER.info("Backfilled %d hours of %s", result, entity_id)
+
+
+@callback
+def async_setup_backfill(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Backfill after the entry is set up and after the broker reconnects.
+
+    The backfill waits for the counters to publish, the increase between
+    their last statistics and their current value is spread over the missing
+    hours following the readings of the Flukso.
+    """
+    cancel: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_run(_: datetime) -> None:
+        nonlocal cancel
+        cancel = None
+        entry.async_create_background_task(
+            hass,
+            async_backfill(hass, entry),
+            f"flukso backfill {entry.data[CONF_DEVICE_HASH]}",
+        )
+
+    @callback
+    def async_schedule() -> None:
+        nonlocal cancel
+        if cancel is None:
+            cancel = async_call_later(hass, BACKFILL_DELAY, async_run)
+
+    @callback
+    def async_connection_status(connected: bool) -> None:
+        if connected:
+            async_schedule()
+
+    @callback
+    def async_cancel() -> None:
+        if cancel is not None:
+            cancel()
+
+    async_schedule()
+    entry.async_on_unload(
+        async_subscribe_connection_status(hass, async_connection_status)
+    )
+    entry.async_on_unload(async_cancel)
@@ -1,14 +1,73 @@
 """Flukso binary sensor."""
-from homeassistant.components.mqtt.binary_sensor import MqttBinarySensor
+from homeassistant.components.mqtt.binary_sensor import (CONF_OFF_DELAY,
+                                                         MqttBinarySensor)
+from homeassistant.components.mqtt.models import ReceiveMessage
 from homeassistant.const import Platform
+from homeassistant.core import callback
 
-from .const import DOMAIN
-from .discovery import get_entities_for_platform
+from .const import CONF_DEVICE_TIMESTAMP, DATA_EXPIRY
+from .entity import FluksoEntity, async_setup_platform_entities
+
+
+class FluksoBinarySensor(FluksoEntity, MqttBinarySensor):
+    """Representation of a Flukso binary sensor decoding its payload natively.
+
+    The off delay of triggered sensors is kept by the shared expiry wheel.
+    """
+
+    def __init__(
+        self,
+        hass,
+        config,
+        config_entry,
+        decoder,
+        stats=None,
+        device_timestamp=False,
+        stale_after=None,
+    ):
+        """Initialize the binary sensor."""
+        self._decoder = decoder
+        self._stats = stats
+        self._device_timestamp = device_timestamp
+        self._stale_after = stale_after
+        self._expiry = hass.data[DATA_EXPIRY]
+        MqttBinarySensor.__init__(self, hass, config, config_entry, None)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop the off delay when removed."""
+        self._expiry.async_cancel(self)
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def async_expire(self) -> None:
+        """Turn off once the off delay passed."""
+        self._attr_is_on = False
+        self.async_write_ha_state()
+
+    @callback
+    def _update_from_message(self, msg: ReceiveMessage) -> bool:
+        """Update the binary sensor from a state message."""
+        was_on = self._attr_is_on
+        self._attr_is_on = self._decoder.decode(msg.payload)
+
+        off_delay = self._config.get(CONF_OFF_DELAY)
+        if self._attr_is_on and off_delay is not None:
+            self._expiry.async_schedule(self, off_delay)
+        else:
+            self._expiry.async_cancel(self)
+
+        return self._attr_force_update or self._attr_is_on != was_on
 
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up MQTT binary sensor."""
-    configs = get_entities_for_platform(
-        Platform.BINARY_SENSOR, hass.data[DOMAIN][config_entry.entry_id]
+    device_timestamp = config_entry.options.get(CONF_DEVICE_TIMESTAMP, False)
+    await async_setup_platform_entities(
+        hass,
+        config_entry,
+        Platform.BINARY_SENSOR,
+        async_add_entities,
+        lambda config, decoder, _, stale_after, stats: FluksoBinarySensor(
+            hass, config, config_entry, decoder, stats, device_timestamp, stale_after
+        ),
     )
-    async_add_entities([MqttBinarySensor(hass, c, config_entry, None) for c in configs])
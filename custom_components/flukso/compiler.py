@@ -0,0 +1,148 @@
+"""Compile the hourly long-term statistics of Flukso counters."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+
+from homeassistant.components.mqtt import ReceiveMessage
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import (StatisticData,
+                                                      StatisticMetaData)
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics, get_last_statistics)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_DISPATCHER, DOMAIN, SIGNAL_CONFIG_UPDATED
+from .decoder import decode_timestamp
+from .descriptors import get_compiled_counters
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FluksoStatisticsCompiler:
+    """Accumulate the hourly state and sum of a counter from its readings.
+
+    The compiler receives the counter messages from the dispatcher like an
+    entity does. It keeps the hour in progress in memory, keyed by the device
+    timestamps, and adds it to the external statistics once the first reading
+    of a later hour comes in. A counter that goes down was reset, its new
+    value is added to the sum.
+    """
+
+    def __init__(self, hass: HomeAssistant, metadata: StatisticMetaData, decoder):
+        """Initialize the compiler."""
+        self.hass = hass
+        self.metadata = metadata
+        self._decoder = decoder
+        self._hour: int | None = None
+        self._timestamp: int | None = None
+        self._state: float | None = None
+        self._sum = 0.0
+        self._unregister_dispatcher: CALLBACK_TYPE | None = None
+
+    async def async_start(self, sensor_id: str) -> None:
+        """Continue from the last statistics and register with the dispatcher."""
+        statistic_id = self.metadata["statistic_id"]
+        last = await get_instance(self.hass).async_add_executor_job(
+            get_last_statistics, self.hass, 1, statistic_id, False, {"state", "sum"}
+        )
+        if last.get(statistic_id):
+            self._state = last[statistic_id][0]["state"]
+            self._sum = last[statistic_id][0]["sum"] or 0.0
+        self._unregister_dispatcher = self.hass.data[DATA_DISPATCHER].async_register(
+            sensor_id, "counter", self
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Unregister from the dispatcher and add the hour in progress."""
+        if self._unregister_dispatcher is not None:
+            self._unregister_dispatcher()
+            self._unregister_dispatcher = None
+        self._async_add_hour()
+
+    @callback
+    def async_handle_message(self, msg: ReceiveMessage) -> None:
+        """Add a counter reading to the hour it was taken in."""
+        try:
+            timestamp = decode_timestamp(msg.payload)
+            value = self._decoder.decode(msg.payload)
+        except ValueError:
+            return
+        if self._timestamp is not None and timestamp <= self._timestamp:
+            return
+        self._timestamp = timestamp
+
+        hour = timestamp - timestamp % 3600
+        if self._hour is not None and hour > self._hour:
+            self._async_add_hour()
+        self._hour = hour
+
+        if self._state is not None:
+            self._sum += value - self._state if value >= self._state else value
+        self._state = value
+
+    @callback
+    def _async_add_hour(self) -> None:
+        if self._hour is None:
+            return
+        async_add_external_statistics(
+            self.hass,
+            self.metadata,
+            [
+                StatisticData(
+                    start=datetime.fromtimestamp(self._hour, dt_util.UTC),
+                    state=self._state,
+                    sum=self._sum,
+                )
+            ],
+        )
+
+
+async def async_setup_compilers(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Compile the statistics of the counters of the Flukso devices of an entry."""
+    compilers: dict[str, FluksoStatisticsCompiler] = {}
+
+    async def async_update_compilers() -> None:
+        counters = {
+            f"{DOMAIN}:{counter[0]}_counter": counter
+            for entry_data in hass.data[DOMAIN][entry.entry_id].values()
+            for counter in get_compiled_counters(entry_data)
+        }
+        for statistic_id in [key for key in compilers if key not in counters]:
+            compilers.pop(statistic_id).async_stop()
+        for statistic_id, (sensor_id, name, unit, decoder) in counters.items():
+            if statistic_id in compilers:
+                continue
+            compiler = FluksoStatisticsCompiler(
+                hass,
+                StatisticMetaData(
+                    has_mean=False,
+                    has_sum=True,
+                    name=name,
+                    source=DOMAIN,
+                    statistic_id=statistic_id,
+                    unit_of_measurement=unit,
+                ),
+                decoder,
+            )
+            compilers[statistic_id] = compiler
+            await compiler.async_start(sensor_id)
+        _LOGGER.debug("Compiling statistics of %s", list(compilers))
+
+    @callback
+    def async_stop_compilers() -> None:
+        for compiler in compilers.values():
+            compiler.async_stop()
+        compilers.clear()
+
+    await async_update_compilers()
+    entry.async_on_unload(async_stop_compilers)
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_CONFIG_UPDATED.format(entry.entry_id), async_update_compilers
+        )
+    )
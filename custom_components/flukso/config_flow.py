@@ -6,10 +6,18 @@ from typing import Any
 
 import voluptuous as vol
 from homeassistant import config_entries
+from homeassistant.const import CONF_HOST
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers.service_info.mqtt import MqttServiceInfo
 
-from .const import CONF_DEVICE_HASH, DOMAIN
+from .const import (AGGREGATE_MEAN, AGGREGATE_METHODS, AGGREGATE_TYPES,
+                    CONF_AGGREGATE_METHOD, CONF_AGGREGATE_WINDOW,
+                    CONF_COMPILE_STATISTICS, CONF_DEADBAND,
+                    CONF_DERIVE_GAUGES, CONF_DEVICE_HASH,
+                    CONF_DEVICE_TIMESTAMP, CONF_FLEET, CONF_HEARTBEAT,
+                    CONF_HISTORY_HOURS, DEFAULT_HEARTBEAT, DOMAIN,
+                    MAX_HISTORY_HOURS)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -23,6 +31,14 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         """Initialize flow."""
         pass
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
     async def _async_create_flukso(self, device_hash):
         unique_id = DOMAIN + "_" + device_hash
 
@@ -35,10 +51,22 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             title=f"Flukso {device_hash}", data={CONF_DEVICE_HASH: device_hash}
         )
 
+    def _is_fleet_configured(self) -> bool:
+        return any(
+            entry.data.get(CONF_FLEET)
+            for entry in self._async_current_entries(include_ignore=False)
+        )
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle a flow initialized by the user."""
+        return self.async_show_menu(step_id="user", menu_options=["device", "fleet"])
+
+    async def async_step_device(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Set up a single Flukso by its device hash."""
         if user_input is not None:
             device_hash = user_input[CONF_DEVICE_HASH]
             if len(device_hash) != 32:
@@ -47,7 +75,22 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
         fields = {}
         fields[vol.Required(CONF_DEVICE_HASH)] = str
-        return self.async_show_form(step_id="user", data_schema=vol.Schema(fields))
+        return self.async_show_form(step_id="device", data_schema=vol.Schema(fields))
+
+    async def async_step_fleet(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Set up all Flukso devices on the broker in one entry."""
+        await self.async_set_unique_id(f"{DOMAIN}_{CONF_FLEET}")
+        self._abort_if_unique_id_configured()
+
+        if user_input is not None:
+            _LOGGER.info("Creating new entry for the Flukso fleet")
+            return self.async_create_entry(
+                title="Flukso fleet", data={CONF_FLEET: True}
+            )
+
+        return self.async_show_form(step_id="fleet")
 
     async def async_step_mqtt(
         self, discovery_info: MqttServiceInfo
@@ -63,5 +106,72 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             return self.async_abort(reason="invalid_discovery_info")
 
         device_hash = splitted_topic[2]
+        if self._is_fleet_configured():
+            # The fleet entry sets up new devices itself
+            return self.async_abort(reason="already_in_fleet")
         _LOGGER.info(f"Discovered device {device_hash}")
         return await self._async_create_flukso(device_hash)
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle Flukso options."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the gauge aggregation and deadband options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        fields = {}
+        for sensor_type in AGGREGATE_TYPES:
+            window = f"{sensor_type}_{CONF_AGGREGATE_WINDOW}"
+            method = f"{sensor_type}_{CONF_AGGREGATE_METHOD}"
+            fields[vol.Required(window, default=options.get(window, 0))] = vol.All(
+                vol.Coerce(int), vol.Range(min=0)
+            )
+            fields[
+                vol.Required(method, default=options.get(method, AGGREGATE_MEAN))
+            ] = vol.In(AGGREGATE_METHODS)
+        fields[
+            vol.Required(CONF_DEADBAND, default=options.get(CONF_DEADBAND, True))
+        ] = bool
+        fields[
+            vol.Required(
+                CONF_HEARTBEAT, default=options.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT)
+            )
+        ] = vol.All(vol.Coerce(int), vol.Range(min=1))
+        fields[
+            vol.Required(
+                CONF_DEVICE_TIMESTAMP,
+                default=options.get(CONF_DEVICE_TIMESTAMP, False),
+            )
+        ] = bool
+        fields[
+            vol.Required(
+                CONF_DERIVE_GAUGES, default=options.get(CONF_DERIVE_GAUGES, False)
+            )
+        ] = bool
+        fields[
+            vol.Required(
+                CONF_COMPILE_STATISTICS,
+                default=options.get(CONF_COMPILE_STATISTICS, False),
+            )
+        ] = bool
+        fields[
+            vol.Required(
+                CONF_HISTORY_HOURS, default=options.get(CONF_HISTORY_HOURS, 0)
+            )
+        ] = vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_HISTORY_HOURS))
+        if not self.config_entry.data.get(CONF_FLEET):
+            fields[
+                vol.Optional(
+                    CONF_HOST, description={"suggested_value": options.get(CONF_HOST)}
+                )
+            ] = str
+        return self.async_show_form(step_id="init", data_schema=vol.Schema(fields))
@@ -1,10 +1,64 @@
 """Constants for the Flukso integration."""
 
 DOMAIN = "flukso"
+DATA_DISPATCHER = f"{DOMAIN}_dispatcher"
+DATA_EXPIRY = f"{DOMAIN}_expiry"
+DATA_WATCHDOG = f"{DOMAIN}_watchdog"
+SERVICE_GET_HISTORY = "get_history"
+SIGNAL_CONFIG_UPDATED = f"{DOMAIN}_config_updated_{{}}"
+DATA_STATS = "stats"
+DATA_HISTORY = f"{DOMAIN}_history"
+DATA_DEVICES = f"{DOMAIN}_devices"
 
 CONF_DEVICE_HASH = "device_hash"
+CONF_FLEET = "fleet"
 CONF_DEVICE_SERIAL = "device_serial"
 CONF_DEVICE_FIRMWARE = "device_firmware"
 CONF_FLM03 = "is_flm03"
+CONF_AGGREGATE_WINDOW = "aggregate_window"
+CONF_AGGREGATE_METHOD = "aggregate_method"
+CONF_DEADBAND = "deadband"
+CONF_HEARTBEAT = "heartbeat"
+CONF_DEVICE_TIMESTAMP = "device_timestamp"
+CONF_DERIVE_GAUGES = "derive_gauges"
+CONF_COMPILE_STATISTICS = "compile_statistics"
+CONF_HISTORY_HOURS = "history_hours"
 
-DEFAULT_TIMEOUT = 10
\ No newline at end of file
+ATTR_SUPPRESSED_UPDATES = "suppressed_updates"
+ATTR_DEVICE_TIMESTAMP = "device_timestamp"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_RESOLUTION = "resolution"
+
+AGGREGATE_MEAN = "mean"
+AGGREGATE_MIN = "min"
+AGGREGATE_MAX = "max"
+AGGREGATE_LAST = "last"
+AGGREGATE_METHODS = [AGGREGATE_MEAN, AGGREGATE_MIN, AGGREGATE_MAX, AGGREGATE_LAST]
+# Sensor types publishing gauges about once per second
+AGGREGATE_TYPES = ["electricity", "water", "gas"]
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_HEARTBEAT = 300
+DISCOVERY_TIMEOUT = 5
+DISCOVERY_OPTIONAL_TIMEOUT = 0.5
+DEFAULT_HISTORY_RESOLUTION = 60
+MAX_HISTORY_HOURS = 168
+# Seconds within which later messages of a sensor only replace each other
+COALESCE_INTERVAL = 0.25
+# One second ticks of the off delay wheel, covering the off delays at once
+EXPIRY_WHEEL_SLOTS = 64
+# Seconds between the scans for sensors that went quiet
+WATCHDOG_INTERVAL = 30
+# Entities constructed and added before yielding to the event loop
+ENTITY_BATCH_SIZE = 50
+# The Flukso publishes its kube, flx and sensor configs together
+CONFIG_UPDATE_COOLDOWN = 1
+STORAGE_KEY = f"{DOMAIN}.discovery"
+STORAGE_VERSION = 2
+STORAGE_SAVE_DELAY = 10
+FLUKSO_HTTP_PORT = 8080
+# Seconds to wait for the counters to publish before backfilling a gap
+BACKFILL_DELAY = 90
+# The Flukso API returns the readings of the last day
+BACKFILL_MAX_GAP = 86400
@@ -0,0 +1,110 @@
+"""Flukso payload decoders."""
+from __future__ import annotations
+
+
+def decode_timestamp(payload):
+    """Return the device timestamp of a payload, raise ValueError if malformed."""
+    return int(payload.split(",", 1)[0])
+
+
+class FluksoValueDecoder:
+    """Decode the value field of a Flukso "timestamp,value,unit" payload.
+
+    The decoded value is ((value / divisor) * multiplier) + offset, rounded to
+    precision digits when a precision is set.
+    """
+
+    __slots__ = ("divisor", "multiplier", "offset", "precision")
+
+    def __init__(self, divisor=1.0, multiplier=1.0, offset=0.0, precision=None):
+        """Initialize the decoder."""
+        self.divisor = float(divisor)
+        self.multiplier = float(multiplier)
+        self.offset = float(offset)
+        self.precision = precision
+
+    def decode(self, payload):
+        """Return the scaled value of the payload, raise ValueError if malformed."""
+        try:
+            value = float(payload.split(",", 2)[1])
+        except IndexError as err:
+            raise ValueError(f"no value field in payload {payload!r}") from err
+        value = (value / self.divisor) * self.multiplier + self.offset
+        if self.precision is not None:
+            value = round(value, self.precision)
+        return value
+
+    def __repr__(self):
+        """Return the decoder parameters."""
+        return (
+            f"FluksoValueDecoder(divisor={self.divisor}, multiplier={self.multiplier}, "
+            f"offset={self.offset}, precision={self.precision})"
+        )
+
+
+class FluksoRateDecoder:
+    """Derive a gauge from the increase of a counter between two payloads.
+
+    The counter value is decoded with the counter decoder, the rate is the
+    increase per second between the device timestamps, times factor. A
+    counter that went down was reset or wrapped, and is taken as the new
+    start. Returns None while there is no rate to derive.
+    """
+
+    __slots__ = ("counter_decoder", "factor", "_value", "_timestamp")
+
+    def __init__(self, counter_decoder, factor=1.0):
+        """Initialize the decoder."""
+        self.counter_decoder = counter_decoder
+        self.factor = float(factor)
+        self._value = None
+        self._timestamp = None
+
+    def decode(self, payload):
+        """Return the rate since the last payload, raise ValueError if malformed."""
+        timestamp = decode_timestamp(payload)
+        value = self.counter_decoder.decode(payload)
+        last_value, last_timestamp = self._value, self._timestamp
+        self._value, self._timestamp = value, timestamp
+        if last_value is None or value < last_value or timestamp <= last_timestamp:
+            return None
+        return (value - last_value) / (timestamp - last_timestamp) * self.factor
+
+    def __repr__(self):
+        """Return the decoder parameters."""
+        return (
+            f"FluksoRateDecoder(counter_decoder={self.counter_decoder!r}, "
+            f"factor={self.factor})"
+        )
+
+
+class FluksoProblemDecoder:
+    """Decode a kube error payload, on when the integer value field is positive."""
+
+    __slots__ = ()
+
+    def decode(self, payload):
+        """Return True if the payload reports an error."""
+        try:
+            return int(float(payload.split(",", 2)[1])) > 0
+        except IndexError as err:
+            raise ValueError(f"no value field in payload {payload!r}") from err
+
+
+class FluksoTriggerDecoder:
+    """Decode a kube movement or vibration payload, on for any message."""
+
+    __slots__ = ()
+
+    def decode(self, payload):
+        """Return True when the payload is not empty."""
+        return bool(payload)
+
+
+DECODER_DEFAULT = FluksoValueDecoder()
+DECODER_TEMPERATURE = FluksoValueDecoder(precision=1)
+DECODER_BATTERY = FluksoValueDecoder(divisor=3.3, multiplier=100, precision=2)
+DECODER_GAS = FluksoValueDecoder(divisor=1000)
+DECODER_POWER_FACTOR = FluksoValueDecoder(multiplier=100, precision=1)
+DECODER_PROBLEM = FluksoProblemDecoder()
+DECODER_TRIGGER = FluksoTriggerDecoder()
@@ -0,0 +1,786 @@
+"""Descriptors of the Flukso sensors and the MQTT entity configs built from them.
+
+This module pulls in the MQTT sensor and binary sensor platforms for their
+schemas, it is only imported by the Flukso platforms.
+"""
+import logging
+from dataclasses import replace
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass
+from homeassistant.components.mqtt import CONF_QOS, CONF_STATE_TOPIC
+from homeassistant.components.mqtt.binary_sensor import CONF_OFF_DELAY
+from homeassistant.components.mqtt.binary_sensor import \
+    PLATFORM_SCHEMA_MODERN as MQTT_BINARY_SENSOR_PLATFORM_SCHEMA
+from homeassistant.components.mqtt.const import (CONF_CONNECTIONS,
+                                                 CONF_ENABLED_BY_DEFAULT,
+                                                 CONF_IDENTIFIERS,
+                                                 CONF_MANUFACTURER,
+                                                 CONF_OBJECT_ID,
+                                                 CONF_SW_VERSION)
+from homeassistant.components.mqtt.schemas import \
+    MQTT_ENTITY_DEVICE_INFO_SCHEMA
+from homeassistant.components.mqtt.sensor import CONF_STATE_CLASS
+from homeassistant.components.mqtt.sensor import \
+    PLATFORM_SCHEMA_MODERN as MQTT_SENSOR_PLATFORM_SCHEMA
+from homeassistant.components.mqtt.util import valid_subscribe_topic
+from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
+from homeassistant.const import (CONF_DEVICE, CONF_DEVICE_CLASS,
+                                 CONF_ENTITY_CATEGORY, CONF_FORCE_UPDATE,
+                                 CONF_ICON, CONF_NAME, CONF_UNIQUE_ID,
+                                 CONF_UNIT_OF_MEASUREMENT,
+                                 UnitOfElectricCurrent,
+                                 UnitOfElectricPotential, UnitOfEnergy,
+                                 LIGHT_LUX, PERCENTAGE,
+                                 POWER_VOLT_AMPERE_REACTIVE, UnitOfPower,
+                                 UnitOfPressure, UnitOfTemperature,
+                                 UnitOfVolume, UnitOfVolume, Platform)
+from homeassistant.helpers.entity import EntityCategory
+from voluptuous.humanize import humanize_error
+
+from .const import (AGGREGATE_MEAN, AGGREGATE_TYPES, CONF_AGGREGATE_METHOD,
+                    CONF_AGGREGATE_WINDOW, CONF_COMPILE_STATISTICS,
+                    CONF_DEADBAND, CONF_DERIVE_GAUGES, CONF_DEVICE_FIRMWARE,
+                    CONF_DEVICE_HASH, CONF_DEVICE_SERIAL, CONF_FLM03,
+                    CONF_HEARTBEAT, CONF_HISTORY_HOURS, DEFAULT_HEARTBEAT,
+                    DEFAULT_TIMEOUT, DOMAIN)
+from .decoder import (DECODER_BATTERY, DECODER_DEFAULT, DECODER_GAS,
+                      DECODER_POWER_FACTOR, DECODER_PROBLEM,
+                      DECODER_TEMPERATURE, DECODER_TRIGGER,
+                      FluksoRateDecoder)
+from .discovery import CONFTYPE_FLX, CONFTYPE_KUBE, CONFTYPE_SENSOR
+from .filters import (FluksoDeadbandFilter, FluksoFilterChain,
+                      FluksoWindowAggregator)
+from .history import FluksoHistory, FluksoHistoryDecoder
+
+_LOGGER = logging.getLogger(__name__)
+
+MODEL_FLM02 = "FLM02"
+MODEL_FLM03 = "FLM03"
+
+DATA_TYPE_MAP_FLM03 = {
+    "electricity": {
+        "gauge": {
+            "pf": ["gauge"],
+            "vrms": ["gauge"],
+            "irms": ["gauge"],
+            "vthd": ["gauge"],
+            "ithd": ["gauge"],
+            "alpha": ["gauge"],
+        },
+        "counter": {
+            "q1": ["gauge", "counter"],
+            "q2": ["gauge", "counter"],
+            "q3": ["gauge", "counter"],
+            "q4": ["gauge", "counter"],
+            "pplus": ["gauge", "counter"],
+            "pminus": ["gauge", "counter"],
+        },
+    },
+    "gas": {"counter": ["gauge", "counter"]},
+    "water": {"counter": ["gauge", "counter"]},
+    "temperature": {"gauge": ["gauge"]},
+    "pressure": {"gauge": ["gauge"]},
+    "battery": {"gauge": ["gauge"]},
+    "light": {"gauge": ["gauge"]},
+    "humidity": {"gauge": ["gauge"]},
+    "error": {"gauge": ["gauge"]},
+    "proximity": {"counter": ["gauge"]},
+    "movement": {"counter": ["gauge"]},
+    "vibration": {"counter": ["gauge"]},
+}
+
+# FLM03 electrical detail and reactive power subtypes, created disabled so
+# their messages are only handled once the entity is enabled
+DISABLED_BY_DEFAULT_SUBTYPES = frozenset(
+    {"pf", "vrms", "irms", "vthd", "ithd", "alpha", "q1", "q2", "q3", "q4"}
+)
+
+DATA_TYPE_MAP_FLM02 = {
+    "electricity": {"counter": ["gauge", "counter"]},
+    "gas": {"counter": ["gauge", "counter"]},
+    "water": {"counter": ["gauge", "counter"]},
+    "temperature": {"gauge": ["gauge"]},
+    "pressure": {"gauge": ["gauge"]},
+    "battery": {"gauge": ["gauge"]},
+    "light": {"gauge": ["gauge"]},
+    "humidity": {"gauge": ["gauge"]},
+    "error": {"gauge": ["gauge"]},
+    "proximity": {"counter": ["gauge"]},
+    "movement": {"counter": ["gauge"]},
+    "vibration": {"counter": ["gauge"]},
+}
+
+UNIT_OF_MEASUREMENT_MAP_FLM03 = {
+    "electricity": {
+        "gauge": {
+            "pf": PERCENTAGE,
+            "q1": POWER_VOLT_AMPERE_REACTIVE,
+            "q2": POWER_VOLT_AMPERE_REACTIVE,
+            "q3": POWER_VOLT_AMPERE_REACTIVE,
+            "q4": POWER_VOLT_AMPERE_REACTIVE,
+            "pplus": UnitOfPower.WATT,
+            "pminus": UnitOfPower.WATT,
+            "vrms": UnitOfElectricPotential.VOLT,
+            "irms": UnitOfElectricCurrent.AMPERE,
+        },
+        "counter": {
+            "q1": "VARh",
+            "q2": "VARh",
+            "q3": "VARh",
+            "q4": "VARh",
+            "pplus": UnitOfEnergy.WATT_HOUR,
+            "pminus": UnitOfEnergy.WATT_HOUR,
+        },
+    },
+    "temperature": UnitOfTemperature.CELSIUS,
+    "pressure": UnitOfPressure.HPA,
+    "battery": PERCENTAGE,
+    "water": {
+        "gauge": "L/s",
+        "counter": UnitOfVolume.LITERS,
+    },
+    "light": LIGHT_LUX,
+    "humidity": PERCENTAGE,
+    "gas":  {
+        "gauge": "m³/s",
+        "counter": UnitOfVolume.CUBIC_METERS,
+    },
+}
+
+UNIT_OF_MEASUREMENT_MAP_FLM02 = {
+    "electricity": {
+        "gauge": UnitOfPower.WATT,
+        "counter": UnitOfEnergy.WATT_HOUR
+    },
+    "temperature": UnitOfTemperature.CELSIUS,
+    "pressure": UnitOfPressure.HPA,
+    "battery": PERCENTAGE,
+    "water": {
+        "gauge": "L/s",
+        "counter": UnitOfVolume.LITERS,
+    },
+    "light": LIGHT_LUX,
+    "humidity": PERCENTAGE,
+    "gas":  {
+        "gauge": "m³/s",
+        "counter": UnitOfVolume.CUBIC_METERS,
+    },
+}
+
+DEVICE_CLASS_MAP_FLM03 = {
+    "electricity": {
+        "gauge": {
+            "pf": SensorDeviceClass.POWER_FACTOR,
+            "q1": SensorDeviceClass.REACTIVE_POWER,
+            "q2": SensorDeviceClass.REACTIVE_POWER,
+            "q3": SensorDeviceClass.REACTIVE_POWER,
+            "q4": SensorDeviceClass.REACTIVE_POWER,
+            "pplus": SensorDeviceClass.POWER,
+            "pminus": SensorDeviceClass.POWER,
+            "vrms": SensorDeviceClass.VOLTAGE,
+            "irms": SensorDeviceClass.CURRENT,
+        },
+        "counter": {
+            "pplus": SensorDeviceClass.ENERGY,
+            "pminus": SensorDeviceClass.ENERGY
+        },
+    },
+    "water": SensorDeviceClass.WATER,
+    "temperature": SensorDeviceClass.TEMPERATURE,
+    "pressure": SensorDeviceClass.PRESSURE,
+    "battery": SensorDeviceClass.BATTERY,
+    "light": SensorDeviceClass.ILLUMINANCE,
+    "humidity": SensorDeviceClass.HUMIDITY,
+    "gas": SensorDeviceClass.GAS,
+    "error": BinarySensorDeviceClass.PROBLEM,
+}
+
+DEVICE_CLASS_MAP_FLM02 = {
+    "electricity": {
+        "gauge": SensorDeviceClass.POWER,
+        "counter": SensorDeviceClass.ENERGY,
+    },
+    "water": SensorDeviceClass.WATER,
+    "temperature": SensorDeviceClass.TEMPERATURE,
+    "pressure": SensorDeviceClass.PRESSURE,
+    "battery": SensorDeviceClass.BATTERY,
+    "light": SensorDeviceClass.ILLUMINANCE,
+    "humidity": SensorDeviceClass.HUMIDITY,
+    "gas": SensorDeviceClass.GAS,
+    "error": BinarySensorDeviceClass.PROBLEM,
+}
+
+ICON_MAP = {
+    "electricity": "mdi:lightning-bolt",
+    "water": "mdi:water",
+    "proximity": "mdi:ruler",
+    "gas": "mdi:fire",
+}
+
+STATE_CLASS_MAP = {
+    "electricity": {
+        "counter": SensorStateClass.TOTAL_INCREASING,
+        "gauge": SensorStateClass.MEASUREMENT,
+    },
+    "water": {
+        "counter": SensorStateClass.TOTAL_INCREASING,
+        "gauge": SensorStateClass.MEASUREMENT,
+    },
+    "gas": {
+        "counter": SensorStateClass.TOTAL_INCREASING,
+        "gauge": SensorStateClass.MEASUREMENT
+    },
+    "temperature": SensorStateClass.MEASUREMENT,
+    "pressure": SensorStateClass.MEASUREMENT,
+    "battery": SensorStateClass.MEASUREMENT,
+    "light": SensorStateClass.MEASUREMENT,
+    "humidity": SensorStateClass.MEASUREMENT,
+    "error": SensorStateClass.MEASUREMENT,
+    "proximity": SensorStateClass.MEASUREMENT,
+    "movement": SensorStateClass.MEASUREMENT,
+    "vibration": SensorStateClass.MEASUREMENT,
+}
+
+# (absolute, relative) change a value has to exceed before its state is
+# written. The thresholds sit between the resolution steps of the decoders.
+DEADBAND_MAP = {
+    "electricity": {
+        "gauge": {
+            "pf": (1.5, None),
+            "vrms": (1.5, None),
+        },
+    },
+    "temperature": (0.15, None),
+    "pressure": (0.5, None),
+    "battery": (1.5, None),
+    "humidity": (1.5, None),
+}
+
+# Seconds a sensor may stay quiet before its entities are unavailable. The
+# FLM publishes electricity every second and pulses at least every minute,
+# kubes report their environment every few minutes and their battery a few
+# times a day. Sensors publishing events only, like movement, are not watched.
+STALE_AFTER_MAP = {
+    "electricity": 300,
+    "water": 900,
+    "gas": 900,
+    "temperature": 1800,
+    "pressure": 1800,
+    "humidity": 1800,
+    "light": 1800,
+    "battery": 43200,
+}
+
+# Factor from the counter increase per second to the gauge unit, Wh/s to W
+RATE_FACTOR_MAP = {
+    "electricity": 3600,
+}
+
+
+def _get_sensor_detail(sensor, detail_map):
+    m = detail_map
+    levels = ["type", "data_type", "subtype"]
+    while isinstance(m, dict) and levels:
+        level = levels.pop(0)
+        if level in sensor:
+            if sensor[level] in m:
+                m = m[sensor[level]]
+            else:
+                m = None
+    return m
+
+
+class FluksoSensorDescriptor:
+    """Precomputed details of the entities for a sensor type, data type and subtype."""
+
+    __slots__ = (
+        "unit_of_measurement",
+        "device_class",
+        "state_class",
+        "icon",
+        "decoder",
+        "deadband",
+        "enabled_by_default",
+        "stale_after",
+    )
+
+    def __init__(
+        self,
+        unit_of_measurement,
+        device_class,
+        state_class,
+        icon,
+        decoder,
+        deadband,
+        enabled_by_default,
+        stale_after,
+    ):
+        """Initialize the descriptor."""
+        self.unit_of_measurement = unit_of_measurement
+        self.device_class = device_class
+        self.state_class = state_class
+        self.icon = icon
+        self.decoder = decoder
+        self.deadband = deadband
+        self.enabled_by_default = enabled_by_default
+        self.stale_after = stale_after
+
+
+MODEL_MAPS = {
+    MODEL_FLM02: (
+        DATA_TYPE_MAP_FLM02,
+        UNIT_OF_MEASUREMENT_MAP_FLM02,
+        DEVICE_CLASS_MAP_FLM02,
+    ),
+    MODEL_FLM03: (
+        DATA_TYPE_MAP_FLM03,
+        UNIT_OF_MEASUREMENT_MAP_FLM03,
+        DEVICE_CLASS_MAP_FLM03,
+    ),
+}
+
+
+def _get_sensor_decoder(sensor):
+    """Select the decoder for the value field of the sensor payload."""
+    if "type" in sensor:
+        if sensor["type"] == "temperature":
+            return DECODER_TEMPERATURE
+        if sensor["type"] == "battery":
+            return DECODER_BATTERY
+        if sensor["type"] == "gas":
+            return DECODER_GAS
+        if sensor["type"] == "electricity":
+            if "subtype" in sensor and sensor["subtype"] == "pf":
+                return DECODER_POWER_FACTOR
+    return DECODER_DEFAULT
+
+
+def _describe_sensor(key):
+    """Walk the detail maps for a (model, type, data_type, subtype) key."""
+    model, sensor_type, data_type, subtype = key
+    sensor = {
+        level: value
+        for level, value in (
+            ("type", sensor_type),
+            ("data_type", data_type),
+            ("subtype", subtype),
+        )
+        if value is not None
+    }
+    data_type_map, unit_map, device_class_map = MODEL_MAPS[model]
+    data_types = _get_sensor_detail(sensor, data_type_map)
+    deadband = _get_sensor_detail(sensor, DEADBAND_MAP)
+    stale_after = _get_sensor_detail(sensor, STALE_AFTER_MAP)
+    descriptor = FluksoSensorDescriptor(
+        _get_sensor_detail(sensor, unit_map),
+        _get_sensor_detail(sensor, device_class_map),
+        _get_sensor_detail(sensor, STATE_CLASS_MAP),
+        _get_sensor_detail(sensor, ICON_MAP),
+        _get_sensor_decoder(sensor),
+        deadband if isinstance(deadband, tuple) else None,
+        subtype not in DISABLED_BY_DEFAULT_SUBTYPES,
+        stale_after if isinstance(stale_after, int) else None,
+    )
+    return descriptor, tuple(data_types) if data_types else ()
+
+
+def _compile_descriptors():
+    """Flatten the detail maps into tables keyed by the sensor key."""
+    descriptors = {}
+    data_types = {}
+    for model, maps in MODEL_MAPS.items():
+        for sensor_type in maps[0]:
+            subtypes = {None}
+            for detail_map in maps:
+                if isinstance(detail_map.get(sensor_type), dict):
+                    for detail in detail_map[sensor_type].values():
+                        if isinstance(detail, dict):
+                            subtypes.update(detail)
+            for data_type in (None, "gauge", "counter"):
+                for subtype in subtypes:
+                    key = (model, sensor_type, data_type, subtype)
+                    descriptors[key], data_types[key] = _describe_sensor(key)
+    return descriptors, data_types
+
+
+SENSOR_DESCRIPTORS, SENSOR_DATA_TYPES = _compile_descriptors()
+
+
+def _get_sensor_descriptor(key):
+    """Return the descriptor for a (model, type, data_type, subtype) key."""
+    descriptor = SENSOR_DESCRIPTORS.get(key)
+    if descriptor is None:
+        # Not in the maps, describe it once with the defaults
+        descriptor, SENSOR_DATA_TYPES[key] = _describe_sensor(key)
+        SENSOR_DESCRIPTORS[key] = descriptor
+    return descriptor
+
+
+def _get_sensor_key(model, sensor):
+    return (model, sensor.type, sensor.data_type, sensor.subtype)
+
+
+def _get_model(entry_data):
+    return MODEL_FLM03 if entry_data[CONF_FLM03] else MODEL_FLM02
+
+
+def _get_sensor_base_name(sensor, entry_data):
+    """Get the kube or flx name, or the port function of the sensor, if any."""
+    if sensor.sensor_class == "kube":
+        return entry_data.get(CONFTYPE_KUBE, {}).get(sensor.kid)
+    if sensor.port is not None:
+        if sensor.function is not None:
+            return sensor.function
+        return entry_data.get(CONFTYPE_FLX, {}).get(sensor.port)
+    return None
+
+
+def _get_sensor_name(sensor, base_name):
+    """Generate a name based on the kube and flx config."""
+    if base_name is not None:
+        return base_name
+    if sensor.sensor_class == "kube":
+        return "unknown kube"
+    return "unknown"
+
+
+def _get_sensor_object_id(sensor, base_name):
+    """Generate an object id based on the name, and the data type and sub type."""
+    name = "unknown" if base_name is None else base_name
+
+    if sensor.type is not None:
+        name = f"{name} {sensor.type}"
+        if sensor.data_type is not None:
+            if sensor.type == "electricity":
+                if sensor.subtype is not None:
+                    name = f"{name} {sensor.subtype} {sensor.data_type}"
+                else:
+                    name = f"{name} {sensor.data_type}"
+            elif sensor.type == "water":
+                name = f"{name} {sensor.data_type}"
+            elif sensor.type == "gas":
+                name = f"{name} {sensor.data_type}"
+    return name
+
+
+def _is_binary_sensor(sensor):
+    return sensor.sensor_class == "kube" and (
+        sensor.type in ("movement", "vibration", "error")
+    )
+
+
+def _get_binary_sensor_entities(entry_data, device_info, errors):
+    """Generate binary sensor configuration."""
+    entities = []
+    model = _get_model(entry_data)
+
+    for sensor in entry_data[CONFTYPE_SENSOR].values():
+        if not _is_binary_sensor(sensor):
+            continue
+
+        descriptor = _get_sensor_descriptor(_get_sensor_key(model, sensor))
+        base_name = _get_sensor_base_name(sensor, entry_data)
+        sensorconfig = {}
+        sensorconfig[CONF_NAME] = _get_sensor_name(sensor, base_name)
+        sensorconfig[CONF_OBJECT_ID] = _get_sensor_object_id(sensor, base_name)
+        sensorconfig[CONF_ENTITY_CATEGORY] = EntityCategory.DIAGNOSTIC
+        sensorconfig[CONF_ENABLED_BY_DEFAULT] = True
+        sensorconfig[CONF_STATE_TOPIC] = f"/sensor/{sensor.id}/{sensor.data_type}"
+        sensorconfig[CONF_QOS] = 0
+        sensorconfig[CONF_FORCE_UPDATE] = False
+        discovery_hash = (
+            entry_data[CONF_DEVICE_HASH],
+            sensor.id,
+            sensor.data_type,
+        )
+        sensorconfig[CONF_UNIQUE_ID] = "_".join(discovery_hash)
+        device_class = descriptor.device_class
+        if device_class:
+            sensorconfig[CONF_DEVICE_CLASS] = device_class
+        if descriptor.icon:
+            sensorconfig[CONF_ICON] = descriptor.icon
+        if descriptor.unit_of_measurement:
+            sensorconfig[CONF_UNIT_OF_MEASUREMENT] = descriptor.unit_of_measurement
+        if device_class and (device_class == BinarySensorDeviceClass.PROBLEM):
+            decoder = DECODER_PROBLEM
+        else:
+            sensorconfig[CONF_OFF_DELAY] = DEFAULT_TIMEOUT
+            decoder = DECODER_TRIGGER
+
+        try:
+            config = _validate_config(
+                Platform.BINARY_SENSOR,
+                MQTT_BINARY_SENSOR_PLATFORM_SCHEMA,
+                sensorconfig,
+                device_info,
+            )
+        except vol.Invalid as err:
+            _report_invalid_config(
+                errors, Platform.BINARY_SENSOR, sensor, sensorconfig, err
+            )
+            continue
+        entities.append((config, decoder, None, descriptor.stale_after))
+
+    return entities
+
+
+def _get_sensor_config(sensor, entry_data, descriptor, base_name):
+    sensorconfig = {}
+    sensorconfig[CONF_NAME] = _get_sensor_name(sensor, base_name)
+    sensorconfig[CONF_OBJECT_ID] = _get_sensor_object_id(sensor, base_name)
+    sensorconfig[CONF_ENTITY_CATEGORY] = EntityCategory.DIAGNOSTIC
+    sensorconfig[CONF_ENABLED_BY_DEFAULT] = descriptor.enabled_by_default
+    sensorconfig[CONF_STATE_TOPIC] = f"/sensor/{sensor.id}/{sensor.data_type}"
+    sensorconfig[CONF_STATE_CLASS] = descriptor.state_class
+    sensorconfig[CONF_QOS] = 0
+    sensorconfig[CONF_FORCE_UPDATE] = True
+    discovery_hash = (
+        entry_data[CONF_DEVICE_HASH],
+        sensor.id,
+        sensor.data_type,
+    )
+    sensorconfig[CONF_UNIQUE_ID] = "_".join(discovery_hash)
+    if descriptor.device_class:
+        sensorconfig[CONF_DEVICE_CLASS] = descriptor.device_class
+    if descriptor.icon:
+        sensorconfig[CONF_ICON] = descriptor.icon
+    if descriptor.unit_of_measurement:
+        sensorconfig[CONF_UNIT_OF_MEASUREMENT] = descriptor.unit_of_measurement
+
+    return sensorconfig
+
+
+def _get_sensor_filter(sensor, descriptor, options):
+    """Create the state filters configured in the entry options for the sensor."""
+    filters = []
+    if sensor.data_type == "gauge" and sensor.type in AGGREGATE_TYPES:
+        window = options.get(f"{sensor.type}_{CONF_AGGREGATE_WINDOW}", 0)
+        if window:
+            method = options.get(
+                f"{sensor.type}_{CONF_AGGREGATE_METHOD}", AGGREGATE_MEAN
+            )
+            filters.append(FluksoWindowAggregator(window, method))
+    if descriptor.deadband is not None and options.get(CONF_DEADBAND, True):
+        absolute, relative = descriptor.deadband
+        heartbeat = options.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT)
+        filters.append(FluksoDeadbandFilter(absolute, relative, heartbeat))
+
+    if not filters:
+        return None
+    if len(filters) == 1:
+        return filters[0]
+    return FluksoFilterChain(filters)
+
+
+def _get_sensor_entities(entry_data, device_info, options, errors):
+    entities = []
+    model = _get_model(entry_data)
+
+    for sensor in entry_data[CONFTYPE_SENSOR].values():
+        if _is_binary_sensor(sensor):
+            continue
+
+        key = _get_sensor_key(model, sensor)
+        _get_sensor_descriptor(key)
+        base_name = _get_sensor_base_name(sensor, entry_data)
+
+        data_types = SENSOR_DATA_TYPES[key]
+        derive_gauge = options.get(CONF_DERIVE_GAUGES, False) and (
+            "gauge" in data_types and "counter" in data_types
+        )
+        compile_statistics = options.get(CONF_COMPILE_STATISTICS, False)
+        history_hours = options.get(CONF_HISTORY_HOURS, 0)
+        for dt in data_types:
+            s = replace(sensor, data_type=dt)
+            descriptor = _get_sensor_descriptor(_get_sensor_key(model, s))
+            config = _get_sensor_config(s, entry_data, descriptor, base_name)
+            decoder = descriptor.decoder
+            stale_after = descriptor.stale_after
+            if compile_statistics and _is_compiled_counter(descriptor):
+                # The statistics are compiled from the counter messages, the
+                # states of the entity are not needed for them
+                config[CONF_STATE_CLASS] = None
+                config[CONF_ENABLED_BY_DEFAULT] = False
+            if derive_gauge and dt == "gauge":
+                # Only the counter is handled, the gauge is its rate
+                counter = replace(s, data_type="counter")
+                config[CONF_STATE_TOPIC] = f"/sensor/{s.id}/counter"
+                counter_descriptor = _get_sensor_descriptor(
+                    _get_sensor_key(model, counter)
+                )
+                decoder = FluksoRateDecoder(
+                    counter_descriptor.decoder, RATE_FACTOR_MAP.get(s.type, 1)
+                )
+                stale_after = counter_descriptor.stale_after
+            if history_hours and dt == "gauge" and s.type in AGGREGATE_TYPES:
+                decoder = FluksoHistoryDecoder(
+                    decoder, FluksoHistory(history_hours * 3600)
+                )
+            try:
+                validated = _validate_config(
+                    Platform.SENSOR, MQTT_SENSOR_PLATFORM_SCHEMA, config, device_info
+                )
+            except vol.Invalid as err:
+                _report_invalid_config(errors, Platform.SENSOR, s, config, err)
+                continue
+            entities.append(
+                (
+                    validated,
+                    decoder,
+                    _get_sensor_filter(s, descriptor, options),
+                    stale_after,
+                )
+            )
+
+    return entities
+
+
+def _is_compiled_counter(descriptor):
+    return (
+        descriptor.state_class == SensorStateClass.TOTAL_INCREASING
+        and descriptor.enabled_by_default
+    )
+
+
+def get_compiled_counters(entry_data):
+    """Generate (sensor id, name, unit, decoder) tuples of the counters to compile."""
+    counters = []
+    model = _get_model(entry_data)
+    for sensor in entry_data[CONFTYPE_SENSOR].values():
+        if _is_binary_sensor(sensor):
+            continue
+
+        key = _get_sensor_key(model, sensor)
+        _get_sensor_descriptor(key)
+        if "counter" not in SENSOR_DATA_TYPES[key]:
+            continue
+        s = replace(sensor, data_type="counter")
+        descriptor = _get_sensor_descriptor(_get_sensor_key(model, s))
+        if _is_compiled_counter(descriptor):
+            base_name = _get_sensor_base_name(sensor, entry_data)
+            counters.append(
+                (
+                    sensor.id,
+                    _get_sensor_object_id(s, base_name),
+                    descriptor.unit_of_measurement,
+                    descriptor.decoder,
+                )
+            )
+    return counters
+
+
+# Fields of the generated entity configs that differ per entity, the other
+# fields follow from the sensor descriptor and the options
+ENTITY_CONFIG_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_NAME): vol.Any(cv.string, None),
+        vol.Required(CONF_OBJECT_ID): cv.string,
+        vol.Required(CONF_UNIQUE_ID): cv.string,
+        vol.Required(CONF_STATE_TOPIC): valid_subscribe_topic,
+    }
+)
+# Stands in for the per-entity fields when validating the other fields
+ENTITY_CONFIG_PLACEHOLDER = {
+    CONF_NAME: DOMAIN,
+    CONF_OBJECT_ID: DOMAIN,
+    CONF_UNIQUE_ID: DOMAIN,
+    CONF_STATE_TOPIC: "/sensor/0/gauge",
+}
+# The validated shared fields, or the arguments of the vol.Invalid errors
+# telling why they are invalid, by platform and fields
+VALIDATED_CONFIGS = {}
+
+
+def _validate_config(platform, schema, config, device_info):
+    """Validate a generated entity config against an MQTT platform schema.
+
+    The fields shared by the entities of a sensor type, data type and subtype
+    are validated by the schema once, with placeholders for the per-entity
+    fields, which are validated on their own. The device info is validated
+    once per Flukso. Raises vol.Invalid.
+    """
+    shared = {
+        key: value
+        for key, value in config.items()
+        if key not in ENTITY_CONFIG_PLACEHOLDER
+    }
+    key = (platform, frozenset(shared.items()))
+    validated = VALIDATED_CONFIGS.get(key)
+    if validated is None:
+        try:
+            validated = schema({**shared, **ENTITY_CONFIG_PLACEHOLDER})
+        except vol.Invalid as err:
+            # Keep what is invalid, not the exception holding on to its frames
+            validated = tuple(
+                (error.msg, error.path, error.error_message, error.error_type)
+                for error in getattr(err, "errors", [err])
+            )
+        VALIDATED_CONFIGS[key] = validated
+    if isinstance(validated, tuple):
+        raise vol.MultipleInvalid([vol.Invalid(*error) for error in validated])
+    return {
+        **validated,
+        **ENTITY_CONFIG_SCHEMA(
+            {field: config[field] for field in ENTITY_CONFIG_PLACEHOLDER}
+        ),
+        CONF_DEVICE: device_info,
+    }
+
+
+def _report_invalid_config(errors, platform, sensor, config, err):
+    """Log why an entity config is invalid and add the reasons to errors."""
+    sensor_id = None if sensor is None else sensor.id
+    _LOGGER.error(
+        "Could not create the %s entity of Flukso sensor %s: %s",
+        platform,
+        sensor_id,
+        humanize_error(config, err),
+    )
+    for error in getattr(err, "errors", [err]):
+        errors.append(
+            {
+                "platform": str(platform),
+                "sensor": sensor_id,
+                "data_type": None if sensor is None else sensor.data_type,
+                "path": [str(part) for part in error.path],
+                "error": error.msg,
+            }
+        )
+
+
+def _get_device_info(entry_data):
+    return {
+        CONF_CONNECTIONS: [],
+        CONF_IDENTIFIERS: {
+            (DOMAIN, entry_data[CONF_DEVICE_HASH]),
+        },
+        CONF_MANUFACTURER: "Flukso",
+        CONF_NAME: entry_data.get(CONF_DEVICE_SERIAL, entry_data[CONF_DEVICE_HASH]),
+        CONF_SW_VERSION: entry_data.get(CONF_DEVICE_FIRMWARE, "unknown"),
+    }
+
+
+def get_entities_for_platform(platform, entry_data, options, errors=None):
+    """Generate (configuration, decoder, filter, stale after) tuples for a platform.
+
+    The stale after seconds are None for sensors that are not watched. The
+    reasons configs are invalid are added to the errors list, when given.
+    """
+    if errors is None:
+        errors = []
+    entities = []
+    device_info = _get_device_info(entry_data)
+    try:
+        device_info = MQTT_ENTITY_DEVICE_INFO_SCHEMA(device_info)
+    except vol.Invalid as err:
+        _report_invalid_config(errors, platform, None, device_info, err)
+        return entities
+    if platform == Platform.BINARY_SENSOR:
+        entities.extend(_get_binary_sensor_entities(entry_data, device_info, errors))
+    elif platform == Platform.SENSOR:
+        entities.extend(
+            _get_sensor_entities(entry_data, device_info, options, errors)
+        )
+    return entities
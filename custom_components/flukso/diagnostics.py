@@ -0,0 +1,39 @@
+"""Diagnostics support for Flukso."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_DISPATCHER, DATA_STATS, DOMAIN
+from .discovery import dump_discovery
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a Flukso config entry."""
+    devices = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": {
+            "data": dict(entry.data),
+            "options": dict(entry.options),
+        },
+        "devices": {
+            device_hash: {
+                "device": dump_discovery(
+                    {
+                        key: value
+                        for key, value in entry_data.items()
+                        if key != DATA_STATS
+                    }
+                ),
+                "stats": entry_data[DATA_STATS].as_dict(),
+            }
+            for device_hash, entry_data in devices.items()
+        },
+        # The sensor topics of all Flukso devices share one subscription
+        "dropped_messages": hass.data[DATA_DISPATCHER].dropped,
+        "coalesced_messages": hass.data[DATA_DISPATCHER].coalesced,
+    }
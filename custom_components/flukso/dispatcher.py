@@ -0,0 +1,138 @@
+"""Flukso sensor message dispatcher."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.components import mqtt
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import COALESCE_INTERVAL
+
+_LOGGER = logging.getLogger(__name__)
+
+SENSOR_TOPIC = "/sensor/+/+"
+
+
+class FluksoDispatcher:
+    """Route messages of one wildcard sensor subscription to the Flukso entities.
+
+    Entities are indexed by (sensor id, data type), the last two levels of the
+    /sensor/<id>/<data_type> topic, so every message costs one dict lookup.
+    Gauges derived from a counter share the key of the counter entity.
+    Messages for sensors without an entity are dropped and counted.
+
+    The first message of a sensor within a flush interval is handed over
+    right away. Further messages of that sensor within the interval, like
+    the backlog a Flukso flushes after a broker reconnect, only replace its
+    pending message, which is handed over when the interval ends. A burst
+    then costs one state write per sensor and interval. Counters are
+    cumulative, so their last value keeps the increase correct.
+
+    The broker only replays the retained messages when the subscription is
+    made, so the last message of every sensor that published a retained one
+    is kept. An entity registering later, like that of a newly paired kube or
+    of another entry, gets the kept message right away.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the dispatcher."""
+        self.hass = hass
+        self._entities = {}
+        self.dropped = 0
+        self.coalesced = 0
+        self._unsubscribe: CALLBACK_TYPE | None = None
+        self._handled: set[tuple[str, str]] = set()
+        self._pending: dict[tuple[str, str], mqtt.ReceiveMessage] = {}
+        self._retained: dict[tuple[str, str], mqtt.ReceiveMessage] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    async def async_subscribe(self) -> None:
+        """Subscribe to the sensor topics of all Flukso devices."""
+        if self._unsubscribe is None:
+            _LOGGER.debug("Subscribing to %s", SENSOR_TOPIC)
+            self._unsubscribe = await mqtt.async_subscribe(
+                self.hass, SENSOR_TOPIC, self._async_message_received, 0
+            )
+
+    @callback
+    def async_unsubscribe(self) -> None:
+        """Unsubscribe from the sensor topics."""
+        if self._unsubscribe is not None:
+            _LOGGER.debug("Unsubscribing from %s", SENSOR_TOPIC)
+            self._unsubscribe()
+            self._unsubscribe = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._handled.clear()
+        self._pending.clear()
+        self._retained.clear()
+
+    @callback
+    def async_register(self, sensor_id, data_type, entity) -> CALLBACK_TYPE:
+        """Route the messages of a sensor id and data type to an entity."""
+        key = (sensor_id, data_type)
+        self._entities[key] = (*self._entities.get(key, ()), entity)
+        if key in self._retained:
+            self.hass.loop.call_soon(self._async_replay, key, entity)
+
+        @callback
+        def async_unregister() -> None:
+            entities = tuple(
+                registered
+                for registered in self._entities.get(key, ())
+                if registered is not entity
+            )
+            if entities:
+                self._entities[key] = entities
+            else:
+                self._entities.pop(key, None)
+
+        return async_unregister
+
+    @callback
+    def _async_replay(self, key: tuple[str, str], entity) -> None:
+        """Hand the kept message of a sensor to an entity that registered."""
+        msg = self._retained.get(key)
+        if msg is not None and entity in self._entities.get(key, ()):
+            entity.async_handle_message(msg)
+
+    @callback
+    def _async_message_received(self, msg: mqtt.ReceiveMessage) -> None:
+        """Hand a sensor message to the entity that owns it."""
+        _, _, sensor_id, data_type = msg.topic.split("/")
+        key = (sensor_id, data_type)
+        if msg.retain or key in self._retained:
+            self._retained[key] = msg
+        entities = self._entities.get(key)
+        if entities is None:
+            self.dropped += 1
+        elif key in self._handled:
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = msg
+        else:
+            self._handled.add(key)
+            if self._flush_handle is None:
+                self._flush_handle = self.hass.loop.call_later(
+                    COALESCE_INTERVAL, self._async_flush
+                )
+            for entity in entities:
+                entity.async_handle_message(msg)
+
+    @callback
+    def _async_flush(self) -> None:
+        """Hand over the pending messages at the end of a flush interval."""
+        pending = self._pending
+        self._pending = {}
+        # Sensors still receiving a burst keep coalescing in the next interval
+        self._handled = set(pending)
+        self._flush_handle = (
+            self.hass.loop.call_later(COALESCE_INTERVAL, self._async_flush)
+            if pending
+            else None
+        )
+        for key, msg in pending.items():
+            for entity in self._entities.get(key, ()):
+                entity.async_handle_message(msg)
@@ -0,0 +1,255 @@
+"""Flukso entity."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Mapping
+from typing import Any
+
+from homeassistant.components.mqtt import ReceiveMessage
+from homeassistant.components.mqtt.const import CONF_STATE_TOPIC
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_UNIQUE_ID, Platform
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.util import dt as dt_util
+
+from .const import (ATTR_DEVICE_TIMESTAMP, CONF_FLM03, DATA_DISPATCHER,
+                    DATA_STATS, DATA_WATCHDOG, DOMAIN, ENTITY_BATCH_SIZE,
+                    SIGNAL_CONFIG_UPDATED)
+from .decoder import decode_timestamp
+from .descriptors import (MODEL_FLM02, MODEL_FLM03,
+                          get_entities_for_platform)
+from .stats import FluksoStats
+from .watchdog import FluksoWatchdog
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FluksoEntity:
+    """Mixin for MQTT entities that receive their messages from the dispatcher.
+
+    Subclasses implement _update_from_message, which returns True when the
+    message changed the state that has to be written, and raises ValueError
+    when the payload is malformed. Messages with a device timestamp that is
+    not newer than the last one of the sensor, like retained messages
+    redelivered after a reconnect, are dropped before the update. When
+    statistics are set, the messages are counted and the time to update from
+    them is measured. When stale after seconds are set, the entity is watched
+    and unavailable while its sensor is quiet for longer.
+    """
+
+    _unrecorded_attributes = frozenset({ATTR_DEVICE_TIMESTAMP})
+
+    _unregister_dispatcher: CALLBACK_TYPE | None = None
+    _stats: FluksoStats | None = None
+    _stats_key: tuple[str, str] | None = None
+    _last_timestamp: int | None = None
+    _device_timestamp = False
+    _stale_after: float | None = None
+    _watchdog: FluksoWatchdog | None = None
+    _watchdog_slot = 0
+
+    @property
+    def available(self) -> bool:
+        """Return False while the sensor is quiet."""
+        if self._watchdog is not None and self._watchdog.is_stale(
+            self._watchdog_slot
+        ):
+            return False
+        return super().available
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        """Add the device timestamp of the state when enabled."""
+        attributes = super().extra_state_attributes
+        if not self._device_timestamp or self._last_timestamp is None:
+            return attributes
+        return {
+            **(attributes or {}),
+            ATTR_DEVICE_TIMESTAMP: dt_util.utc_from_timestamp(
+                self._last_timestamp
+            ).isoformat(),
+        }
+
+    @callback
+    def _prepare_subscribe_topics(self) -> None:
+        """Do not subscribe, the dispatcher routes the state topic to us."""
+
+    async def _subscribe_topics(self) -> None:
+        """Register the state topic with the dispatcher."""
+        _, _, sensor_id, data_type = self._config[CONF_STATE_TOPIC].split("/")
+        self._stats_key = (sensor_id, data_type)
+        self._unregister_dispatcher = self.hass.data[DATA_DISPATCHER].async_register(
+            sensor_id, data_type, self
+        )
+        if self._stale_after is not None and self._watchdog is None:
+            self._watchdog = self.hass.data[DATA_WATCHDOG]
+            self._watchdog_slot = self._watchdog.async_register(
+                self, self._stale_after
+            )
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Unregister from the dispatcher and the watchdog when removed."""
+        if self._unregister_dispatcher is not None:
+            self._unregister_dispatcher()
+            self._unregister_dispatcher = None
+        if self._watchdog is not None:
+            self._watchdog.async_unregister(self._watchdog_slot)
+            self._watchdog = None
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def async_handle_message(self, msg: ReceiveMessage) -> None:
+        """Handle a state message routed by the dispatcher."""
+        stats = self._stats
+        if stats is not None:
+            start = time.monotonic()
+        try:
+            timestamp = decode_timestamp(msg.payload)
+            last_timestamp = self._last_timestamp
+            if last_timestamp is not None and timestamp <= last_timestamp:
+                if stats is not None:
+                    if timestamp == last_timestamp:
+                        stats.async_duplicate()
+                    else:
+                        stats.async_stale()
+                return
+            self._last_timestamp = timestamp
+            changed = self._update_from_message(msg)
+        except ValueError:
+            _LOGGER.warning(
+                "Invalid state message '%s' from '%s'", msg.payload, msg.topic
+            )
+            if stats is not None:
+                stats.async_malformed()
+            return
+        if self._watchdog is not None and self._watchdog.async_seen(
+            self._watchdog_slot
+        ):
+            changed = True
+        if stats is not None:
+            now = time.monotonic()
+            stats.async_message(self._stats_key, now - start, now)
+        if changed:
+            self.async_write_ha_state()
+
+    @callback
+    def _update_from_message(self, msg: ReceiveMessage) -> bool:
+        """Update the entity from a state message."""
+        raise NotImplementedError
+
+
+def _is_sensor_unique_id(unique_id: str) -> bool:
+    """Return True if the unique id is of the entity of a Flukso sensor.
+
+    These are the device hash, sensor id and data type, the diagnostic
+    entities of a Flukso have no sensor id.
+    """
+    parts = unique_id.split("_", 2)
+    return len(parts) == 3 and len(parts[1]) == 32
+
+
+async def async_setup_platform_entities(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    platform: Platform,
+    async_add_entities: AddEntitiesCallback,
+    entity_factory: Callable[..., FluksoEntity],
+) -> None:
+    """Add the entities of a platform and keep them in sync with the Flukso configs.
+
+    The entity factory is called with the config, decoder, filter and stale
+    after seconds of an entity and the statistics of its Flukso. When a Flukso
+    of the entry republishes its configs the generated entity configs of the
+    entry are diffed against the current entities by unique id. Only entities that are
+    new, gone or got a different config are added, removed or replaced, the
+    others keep receiving their messages. The registry entries of sensors that
+    are gone are removed, also of disabled entities that were never added. New
+    entities are constructed and added in batches, yielding to the event loop
+    in between.
+    """
+    entities: dict[str, FluksoEntity] = {}
+    lock = asyncio.Lock()
+
+    @callback
+    def async_track(unique_id: str, entity: FluksoEntity) -> None:
+        @callback
+        def async_untrack() -> None:
+            if entities.get(unique_id) is entity:
+                del entities[unique_id]
+
+        entities[unique_id] = entity
+        entity.async_on_remove(async_untrack)
+
+    async def async_reconcile() -> None:
+        async with lock:
+            devices = hass.data[DOMAIN][config_entry.entry_id]
+            configs = {}
+            for entry_data in devices.values():
+                stats = entry_data[DATA_STATS]
+                errors = []
+                platform_configs = get_entities_for_platform(
+                    platform, entry_data, config_entry.options, errors
+                )
+                for config, *details in platform_configs:
+                    configs[config[CONF_UNIQUE_ID]] = (config, *details, stats)
+                stats.model = MODEL_FLM03 if entry_data[CONF_FLM03] else MODEL_FLM02
+                stats.entities[platform] = len(platform_configs)
+                stats.invalid_configs[platform] = errors
+                await asyncio.sleep(0)
+
+            stale = [
+                unique_id
+                for unique_id, entity in entities.items()
+                if unique_id not in configs
+                or entity._config != configs[unique_id][0]
+            ]
+            for unique_id in stale:
+                await entities.pop(unique_id).async_remove(force_remove=True)
+
+            # Also entities that are disabled, or whose sensor went away while
+            # Home Assistant was stopped, are only known to the registry
+            entity_registry = er.async_get(hass)
+            for registry_entry in er.async_entries_for_config_entry(
+                entity_registry, config_entry.entry_id
+            ):
+                if (
+                    registry_entry.domain == platform
+                    and _is_sensor_unique_id(registry_entry.unique_id)
+                    and registry_entry.unique_id not in configs
+                ):
+                    entity_registry.async_remove(registry_entry.entity_id)
+
+            added = 0
+            new_entities = []
+            for unique_id, entity_config in configs.items():
+                if unique_id in entities:
+                    continue
+                entity = entity_factory(*entity_config)
+                async_track(unique_id, entity)
+                new_entities.append(entity)
+                if len(new_entities) == ENTITY_BATCH_SIZE:
+                    async_add_entities(new_entities)
+                    added += len(new_entities)
+                    new_entities = []
+                    await asyncio.sleep(0)
+            async_add_entities(new_entities)
+            added += len(new_entities)
+
+            _LOGGER.debug(
+                "%s: removed or replaced %d, added %d entities",
+                platform,
+                len(stale),
+                added,
+            )
+
+    await async_reconcile()
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_CONFIG_UPDATED.format(config_entry.entry_id), async_reconcile
+        )
+    )
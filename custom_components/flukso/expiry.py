@@ -0,0 +1,83 @@
+"""Shared off delay of the Flukso binary sensors."""
+from __future__ import annotations
+
+import asyncio
+import math
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import EXPIRY_WHEEL_SLOTS
+
+
+class FluksoExpiryWheel:
+    """Hashed timer wheel turning off the binary sensors after their off delay.
+
+    Time is divided in ticks of a second. An entity is kept in the slot of
+    the tick it expires at, modulo the number of slots, and its tick in a
+    dict, so a trigger reschedules the entity by moving it between two sets
+    instead of cancelling and adding a timer on the event loop. While
+    entities are scheduled a single timer fires every tick and calls
+    async_expire on all entities of the slot whose tick has come, in one
+    batch. Entities expiring more than a wheel turn away are skipped until
+    their turn.
+    """
+
+    def __init__(self, hass: HomeAssistant, slots: int = EXPIRY_WHEEL_SLOTS) -> None:
+        """Initialize the wheel."""
+        self.hass = hass
+        self._slots: list[set] = [set() for _ in range(slots)]
+        self._deadlines: dict = {}
+        self._tick = 0
+        self._timer: asyncio.TimerHandle | None = None
+
+    def __len__(self) -> int:
+        """Return the number of scheduled entities."""
+        return len(self._deadlines)
+
+    @callback
+    def async_schedule(self, entity, delay: float) -> None:
+        """Expire an entity after delay seconds, replacing its earlier deadline."""
+        now = self.hass.loop.time()
+        deadline = math.ceil(now + delay)
+        previous = self._deadlines.get(entity)
+        if previous == deadline:
+            return
+        if previous is not None:
+            self._slots[previous % len(self._slots)].discard(entity)
+        self._deadlines[entity] = deadline
+        self._slots[deadline % len(self._slots)].add(entity)
+        if self._timer is None:
+            self._tick = math.floor(now)
+            self._timer = self.hass.loop.call_at(self._tick + 1, self._async_tick)
+
+    @callback
+    def async_cancel(self, entity) -> None:
+        """Stop an entity from expiring."""
+        deadline = self._deadlines.pop(entity, None)
+        if deadline is not None:
+            self._slots[deadline % len(self._slots)].discard(entity)
+        if not self._deadlines and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @callback
+    def _async_tick(self) -> None:
+        """Expire the entities of the ticks that passed since the last one."""
+        slots = len(self._slots)
+        # A timer may fire a little early, it is due for at least one tick
+        now = max(math.floor(self.hass.loop.time()), self._tick + 1)
+        expired = []
+        for tick in range(max(self._tick + 1, now - slots + 1), now + 1):
+            slot = self._slots[tick % slots]
+            for entity in [e for e in slot if self._deadlines[e] <= now]:
+                slot.discard(entity)
+                del self._deadlines[entity]
+                expired.append(entity)
+        self._tick = now
+        self._timer = (
+            self.hass.loop.call_at(now + 1, self._async_tick)
+            if self._deadlines
+            else None
+        )
+        for entity in expired:
+            entity.async_expire()
@@ -0,0 +1,134 @@
+"""Flukso sensor state filters.
+
+A filter sits between the payload decoder and the state machine. Its update
+method receives every decoded value with a monotonic timestamp and returns the
+value to write, or None when no state should be written for this message.
+"""
+from __future__ import annotations
+
+from .const import (AGGREGATE_LAST, AGGREGATE_MAX, AGGREGATE_MEAN,
+                    AGGREGATE_MIN, ATTR_SUPPRESSED_UPDATES)
+
+
+class FluksoWindowAggregator:
+    """Aggregate the values received during a time window into one state."""
+
+    __slots__ = (
+        "window",
+        "method",
+        "attributes",
+        "_start",
+        "_count",
+        "_sum",
+        "_min",
+        "_max",
+        "_last",
+    )
+
+    def __init__(self, window, method=AGGREGATE_MEAN):
+        """Initialize the aggregator for a window in seconds."""
+        self.window = window
+        self.method = method
+        self.attributes = None
+        self._start = 0.0
+        self._count = 0
+        self._sum = 0.0
+        self._min = 0.0
+        self._max = 0.0
+        self._last = 0.0
+
+    def update(self, value, now):
+        """Add a value, return the aggregate when the window is complete."""
+        if self._count == 0:
+            self._start = now
+            self._sum = 0.0
+            self._min = self._max = value
+        elif value < self._min:
+            self._min = value
+        elif value > self._max:
+            self._max = value
+        self._count += 1
+        self._sum += value
+        self._last = value
+
+        if now - self._start < self.window:
+            return None
+
+        self.attributes = {"min": self._min, "max": self._max}
+        if self.method == AGGREGATE_MIN:
+            result = self._min
+        elif self.method == AGGREGATE_MAX:
+            result = self._max
+        elif self.method == AGGREGATE_LAST:
+            result = self._last
+        else:
+            result = self._sum / self._count
+        self._count = 0
+        return result
+
+
+class FluksoDeadbandFilter:
+    """Only pass values that moved beyond a threshold since the last state.
+
+    A value passes when it differs from the last passed value by more than the
+    absolute threshold or by more than the relative threshold times that
+    value. A threshold of None is not checked. Values pass regardless once
+    heartbeat seconds went by since the last passed value.
+    """
+
+    __slots__ = ("absolute", "relative", "heartbeat", "suppressed", "_last", "_time")
+
+    def __init__(self, absolute, relative, heartbeat):
+        """Initialize the filter."""
+        self.absolute = absolute
+        self.relative = relative
+        self.heartbeat = heartbeat
+        self.suppressed = 0
+        self._last = None
+        self._time = 0.0
+
+    @property
+    def attributes(self):
+        """Return the number of suppressed updates."""
+        return {ATTR_SUPPRESSED_UPDATES: self.suppressed}
+
+    def update(self, value, now):
+        """Return the value when it is significant, None otherwise."""
+        last = self._last
+        if last is not None and now - self._time < self.heartbeat:
+            delta = abs(value - last)
+            if (self.absolute is None or delta <= self.absolute) and (
+                self.relative is None or delta <= self.relative * abs(last)
+            ):
+                self.suppressed += 1
+                return None
+        self._last = value
+        self._time = now
+        return value
+
+
+class FluksoFilterChain:
+    """Pass values through several filters in order."""
+
+    __slots__ = ("filters",)
+
+    def __init__(self, filters):
+        """Initialize the chain."""
+        self.filters = filters
+
+    @property
+    def attributes(self):
+        """Return the merged attributes of the filters."""
+        attributes = {}
+        for state_filter in self.filters:
+            if state_filter.attributes:
+                attributes.update(state_filter.attributes)
+        return attributes
+
+    def update(self, value, now):
+        """Return the value passed by all filters, None if one holds it back."""
+        for state_filter in self.filters:
+            value = state_filter.update(value, now)
+            if value is None:
+                return None
+        return value
@@ -0,0 +1,114 @@
+"""In-memory high resolution history of Flukso gauges."""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+
+from .decoder import decode_timestamp
+
+
+class FluksoHistory:
+    """Fixed-size ring buffer of the (device timestamp, value) samples of a gauge.
+
+    The timestamps and values are kept in two arrays of size samples,
+    allocated with the first sample, 8 bytes per sample, so a day of 1 Hz
+    samples takes 675 KiB. Once full, a sample overwrites the oldest one.
+    Samples are appended in device timestamp order, which the entities
+    guarantee by dropping stale messages.
+    """
+
+    __slots__ = ("size", "_timestamps", "_values", "_next", "_count")
+
+    def __init__(self, size):
+        """Initialize an empty buffer of size samples."""
+        self.size = size
+        self._timestamps = None
+        self._values = None
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        """Return the number of samples in the buffer."""
+        return self._count
+
+    def append(self, timestamp, value):
+        """Add a sample, overwriting the oldest one when full."""
+        if self._timestamps is None:
+            self._timestamps = array("I", bytes(4 * self.size))
+            self._values = array("f", bytes(4 * self.size))
+        self._timestamps[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.size
+        if self._count < self.size:
+            self._count += 1
+
+    def _segments(self):
+        """Return the (lo, hi) index ranges of the samples, oldest first."""
+        if self._count == 0:
+            return ()
+        if self._count < self.size:
+            return ((0, self._count),)
+        return ((self._next, self.size), (0, self._next))
+
+    def window(self, start, end, resolution):
+        """Downsample the samples from start up to end into resolution buckets.
+
+        Returns the bucket start timestamps and the mean, minimum and maximum
+        of the samples in every bucket, leaving out empty buckets.
+        """
+        timestamps = self._timestamps
+        values = self._values
+        buckets = []
+        means = []
+        minimums = []
+        maximums = []
+        bucket = None
+        for lo, hi in self._segments():
+            first = bisect_left(timestamps, start, lo, hi)
+            last = bisect_left(timestamps, end, first, hi)
+            for index in range(first, last):
+                timestamp = timestamps[index]
+                value = values[index]
+                if bucket is None or timestamp >= bucket + resolution:
+                    if bucket is not None:
+                        means.append(total / count)
+                    bucket = timestamp - timestamp % resolution
+                    buckets.append(bucket)
+                    minimums.append(value)
+                    maximums.append(value)
+                    total = 0.0
+                    count = 0
+                elif value < minimums[-1]:
+                    minimums[-1] = value
+                elif value > maximums[-1]:
+                    maximums[-1] = value
+                total += value
+                count += 1
+        if bucket is not None:
+            means.append(total / count)
+        return buckets, means, minimums, maximums
+
+
+class FluksoHistoryDecoder:
+    """Wrap a decoder, adding the decoded values to the history of the gauge."""
+
+    __slots__ = ("decoder", "history")
+
+    def __init__(self, decoder, history):
+        """Initialize the decoder."""
+        self.decoder = decoder
+        self.history = history
+
+    def decode(self, payload):
+        """Return the decoded value after adding it to the history."""
+        value = self.decoder.decode(payload)
+        if value is not None:
+            self.history.append(decode_timestamp(payload), value)
+        return value
+
+    def __repr__(self):
+        """Return the wrapped decoder and history size."""
+        return (
+            f"FluksoHistoryDecoder(decoder={self.decoder!r}, "
+            f"size={self.history.size})"
+        )
@@ -0,0 +1,59 @@
+"""Compact representations of the Flukso configs."""
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass
+
+
+def _intern(value):
+    """Share the strings that repeat across the sensors of all devices."""
+    return None if value is None else sys.intern(str(value))
+
+
+@dataclass(frozen=True, slots=True)
+class FluksoSensorConfig:
+    """The fields of an enabled sensor of a Flukso the entities are built from.
+
+    Kube ids and ports are kept as the strings the kube and flx configs are
+    keyed by.
+    """
+
+    id: str
+    sensor_class: str | None = None
+    type: str | None = None
+    data_type: str | None = None
+    subtype: str | None = None
+    function: str | None = None
+    port: str | None = None
+    kid: str | None = None
+
+    @classmethod
+    def from_json(cls, sensor: dict) -> FluksoSensorConfig:
+        """Create the config from a sensor of the sensor config JSON."""
+        return cls(
+            id=sensor["id"],
+            sensor_class=_intern(sensor.get("class")),
+            type=_intern(sensor.get("type")),
+            data_type=_intern(sensor.get("data_type")),
+            subtype=_intern(sensor.get("subtype")),
+            function=sensor.get("function"),
+            port=_intern(sensor["port"][0]) if sensor.get("port") else None,
+            kid=_intern(sensor.get("kid")),
+        )
+
+    def as_json(self) -> dict:
+        """Return the sensor JSON the config is created from."""
+        sensor = {"id": self.id, "enable": 1}
+        for key, value in (
+            ("class", self.sensor_class),
+            ("type", self.type),
+            ("data_type", self.data_type),
+            ("subtype", self.subtype),
+            ("function", self.function),
+            ("kid", self.kid),
+        ):
+            if value is not None:
+                sensor[key] = value
+        if self.port is not None:
+            sensor["port"] = [self.port]
+        return sensor
@@ -1,14 +1,204 @@
 """Flukso sensor."""
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.mqtt.models import ReceiveMessage
 from homeassistant.components.mqtt.sensor import MqttSensor
-from homeassistant.const import Platform
+from homeassistant.components.sensor import (SensorDeviceClass, SensorEntity,
+                                             SensorEntityDescription,
+                                             SensorStateClass)
+from homeassistant.const import CONF_HOST, Platform, UnitOfTime
+from homeassistant.core import callback
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.typing import StateType
+
+from .backfill import async_setup_backfill
+from .compiler import async_setup_compilers
+from .const import (ATTR_DEVICE_TIMESTAMP, ATTR_SUPPRESSED_UPDATES,
+                    CONF_COMPILE_STATISTICS, CONF_DEVICE_HASH,
+                    CONF_DEVICE_SERIAL, CONF_DEVICE_TIMESTAMP, DATA_HISTORY,
+                    DATA_STATS, DOMAIN)
+from .entity import FluksoEntity, async_setup_platform_entities
+from .history import FluksoHistoryDecoder
+from .stats import FluksoStats
+
+
+class FluksoSensor(FluksoEntity, MqttSensor):
+    """Representation of a Flukso sensor decoding its payload natively."""
+
+    _unrecorded_attributes = frozenset(
+        {ATTR_DEVICE_TIMESTAMP, ATTR_SUPPRESSED_UPDATES}
+    )
+
+    def __init__(
+        self,
+        hass,
+        config,
+        config_entry,
+        decoder,
+        state_filter,
+        stats=None,
+        device_timestamp=False,
+        stale_after=None,
+    ):
+        """Initialize the sensor."""
+        self._decoder = decoder
+        self._state_filter = state_filter
+        self._stats = stats
+        self._device_timestamp = device_timestamp
+        self._stale_after = stale_after
+        MqttSensor.__init__(self, hass, config, config_entry, None)
+
+    async def async_added_to_hass(self) -> None:
+        """Make the history of the sensor available to the history service."""
+        await super().async_added_to_hass()
+        if isinstance(self._decoder, FluksoHistoryDecoder):
+            histories = self.hass.data[DATA_HISTORY]
+            entity_id = self.entity_id
+            histories[entity_id] = self._decoder.history
+
+            @callback
+            def async_remove_history() -> None:
+                if histories.get(entity_id) is self._decoder.history:
+                    del histories[entity_id]
+
+            self.async_on_remove(async_remove_history)
+
+    @callback
+    def _update_from_message(self, msg: ReceiveMessage) -> bool:
+        """Update the sensor from a state message."""
+        value = self._decoder.decode(msg.payload)
+        if value is None:
+            return False
+        if self._state_filter is not None:
+            value = self._state_filter.update(value, time.monotonic())
+            if value is None:
+                return False
+            self._attr_extra_state_attributes = self._state_filter.attributes
+        self._attr_native_value = value
+        return True
 
-from .const import DOMAIN
-from .discovery import get_entities_for_platform
+
+@dataclass(frozen=True, kw_only=True)
+class FluksoStatsSensorEntityDescription(SensorEntityDescription):
+    """Describe a Flukso statistics sensor."""
+
+    value_fn: Callable[[FluksoStats], StateType]
+
+
+STATS_SENSORS: tuple[FluksoStatsSensorEntityDescription, ...] = (
+    FluksoStatsSensorEntityDescription(
+        key="message_rate",
+        translation_key="message_rate",
+        native_unit_of_measurement="msg/s",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.message_rate(),
+    ),
+    FluksoStatsSensorEntityDescription(
+        key="decode_latency",
+        translation_key="decode_latency",
+        native_unit_of_measurement=UnitOfTime.MICROSECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=1,
+        value_fn=lambda stats: (
+            None if stats.latency_ewma is None else stats.latency_ewma * 1e6
+        ),
+    ),
+    FluksoStatsSensorEntityDescription(
+        key="malformed_messages",
+        translation_key="malformed_messages",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.malformed,
+    ),
+    FluksoStatsSensorEntityDescription(
+        key="duplicate_messages",
+        translation_key="duplicate_messages",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.duplicates,
+    ),
+    FluksoStatsSensorEntityDescription(
+        key="stale_messages",
+        translation_key="stale_messages",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.stale,
+    ),
+    FluksoStatsSensorEntityDescription(
+        key="discovery_duration",
+        translation_key="discovery_duration",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        suggested_display_precision=3,
+        value_fn=lambda stats: (
+            round(sum(stats.discovery.values()), 3) if stats.discovery else None
+        ),
+    ),
+)
+
+
+class FluksoStatsSensor(SensorEntity):
+    """Diagnostic sensor showing the message statistics of a Flukso."""
+
+    entity_description: FluksoStatsSensorEntityDescription
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, stats, entry_data, description):
+        """Initialize the sensor."""
+        device_hash = entry_data[CONF_DEVICE_HASH]
+        self.entity_description = description
+        self._stats = stats
+        self._attr_unique_id = f"{device_hash}_{description.key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, device_hash)},
+            manufacturer="Flukso",
+            name=entry_data.get(CONF_DEVICE_SERIAL, device_hash),
+        )
+
+    async def async_update(self) -> None:
+        """Read the statistics."""
+        self._attr_native_value = self.entity_description.value_fn(self._stats)
 
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
-    """Set up MQTT sensor."""
-    configs = get_entities_for_platform(
-        Platform.SENSOR, hass.data[DOMAIN][config_entry.entry_id]
+    """Set up MQTT sensor, and the statistics of the counters.
+
+    The statistics compiler and the backfill load with this platform, with
+    the recorder modules they need.
+    """
+    device_timestamp = config_entry.options.get(CONF_DEVICE_TIMESTAMP, False)
+    await async_setup_platform_entities(
+        hass,
+        config_entry,
+        Platform.SENSOR,
+        async_add_entities,
+        lambda config, decoder, state_filter, stale_after, stats: FluksoSensor(
+            hass,
+            config,
+            config_entry,
+            decoder,
+            state_filter,
+            stats,
+            device_timestamp,
+            stale_after,
+        ),
+    )
+    async_add_entities(
+        [
+            FluksoStatsSensor(entry_data[DATA_STATS], entry_data, description)
+            for entry_data in hass.data[DOMAIN][config_entry.entry_id].values()
+            for description in STATS_SENSORS
+        ],
+        update_before_add=True,
     )
-    async_add_entities([MqttSensor(hass, c, config_entry, None) for c in configs])
+    if "recorder" in hass.config.components:
+        if config_entry.options.get(CONF_COMPILE_STATISTICS, False):
+            # The counter entities have no statistics of their own to backfill
+            await async_setup_compilers(hass, config_entry)
+        elif config_entry.options.get(CONF_HOST):
+            async_setup_backfill(hass, config_entry)
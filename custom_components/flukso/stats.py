@@ -0,0 +1,109 @@
+"""Flukso message statistics."""
+from __future__ import annotations
+
+import time
+from bisect import bisect_right
+
+from homeassistant.core import callback
+
+# Upper bounds of the decode latency histogram buckets, in seconds
+LATENCY_BUCKETS = (10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 5e-3)
+LATENCY_EWMA_ALPHA = 0.05
+# Seconds over which the message rate is counted
+RATE_WINDOW = 60
+
+
+class FluksoStats:
+    """Count the messages a Flukso config entry handles.
+
+    Messages are counted per (sensor id, data type), and over a window for
+    the current message rate. The time to decode and filter a message is
+    tracked as an exponentially weighted moving average and a histogram.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the statistics."""
+        self.started = time.monotonic()
+        self.messages: dict[tuple[str, str], int] = {}
+        self.total = 0
+        self.malformed = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.latency_ewma: float | None = None
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.discovery: dict[str, float] = {}
+        self.model: str | None = None
+        self.entities: dict[str, int] = {}
+        self.invalid_configs: dict[str, list[dict]] = {}
+        self._rate = 0.0
+        self._window_start = self.started
+        self._window_count = 0
+
+    def _roll_window(self, now: float) -> None:
+        elapsed = now - self._window_start
+        if elapsed >= RATE_WINDOW:
+            self._rate = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+
+    @callback
+    def async_message(self, key: tuple[str, str], latency: float, now: float) -> None:
+        """Count a decoded message and its decode latency, now is time.monotonic."""
+        self.messages[key] = self.messages.get(key, 0) + 1
+        self.total += 1
+        self._window_count += 1
+        self._roll_window(now)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += LATENCY_EWMA_ALPHA * (latency - self.latency_ewma)
+        self.latency_histogram[bisect_right(LATENCY_BUCKETS, latency)] += 1
+
+    @callback
+    def async_malformed(self) -> None:
+        """Count a message that could not be decoded."""
+        self.malformed += 1
+
+    @callback
+    def async_duplicate(self) -> None:
+        """Count a message repeating the device timestamp of its sensor."""
+        self.duplicates += 1
+
+    @callback
+    def async_stale(self) -> None:
+        """Count a message older than the last message of its sensor."""
+        self.stale += 1
+
+    def message_rate(self) -> float:
+        """Return the number of messages per second over the last window."""
+        self._roll_window(time.monotonic())
+        return round(self._rate, 2)
+
+    def messages_per_second(self) -> dict[str, float]:
+        """Return the average message rate per sensor id and data type."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            f"{sensor_id}/{data_type}": round(count / elapsed, 3)
+            for (sensor_id, data_type), count in self.messages.items()
+        }
+
+    def as_dict(self) -> dict:
+        """Return the statistics for diagnostics."""
+        buckets = [f"<{bound * 1e6:g}us" for bound in LATENCY_BUCKETS]
+        buckets.append(f">={LATENCY_BUCKETS[-1] * 1e6:g}us")
+        return {
+            "uptime": round(time.monotonic() - self.started, 1),
+            "messages": self.total,
+            "message_rate": self.message_rate(),
+            "messages_per_second": self.messages_per_second(),
+            "malformed": self.malformed,
+            "duplicates": self.duplicates,
+            "stale": self.stale,
+            "decode_latency_ewma_us": (
+                None if self.latency_ewma is None else round(self.latency_ewma * 1e6, 2)
+            ),
+            "decode_latency_histogram": dict(zip(buckets, self.latency_histogram)),
+            "discovery_duration": self.discovery,
+            "entities": {self.model: self.entities},
+            "invalid_configs": self.invalid_configs,
+        }
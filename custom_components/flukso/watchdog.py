@@ -0,0 +1,107 @@
+"""Unavailability of Flukso sensors that went quiet."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from array import array
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import WATCHDOG_INTERVAL
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FluksoWatchdog:
+    """Mark the entities of quiet sensors unavailable, scanning them all at once.
+
+    Every watched entity gets a slot in compact arrays holding the loop time
+    of its last message, the seconds it may stay quiet and whether it is
+    stale. A message only stores the time in the slot of its entity. While
+    entities are watched, a single timer scans the arrays every interval and
+    writes the state of all entities that went stale in one batch, like all
+    sensors of a Flukso, port or kube that stopped publishing. Slots of
+    removed entities are reused.
+    """
+
+    def __init__(self, hass: HomeAssistant, interval: float = WATCHDOG_INTERVAL):
+        """Initialize the watchdog."""
+        self.hass = hass
+        self.interval = interval
+        self._last_seen = array("d")
+        self._stale_after = array("d")
+        self._stale = bytearray()
+        self._entities: list = []
+        self._free: list[int] = []
+        self._timer: asyncio.TimerHandle | None = None
+
+    def __len__(self) -> int:
+        """Return the number of watched entities."""
+        return len(self._entities) - len(self._free)
+
+    @callback
+    def async_register(self, entity, stale_after: float) -> int:
+        """Watch an entity that is stale after stale_after quiet seconds."""
+        now = self.hass.loop.time()
+        if self._free:
+            slot = self._free.pop()
+            self._last_seen[slot] = now
+            self._stale_after[slot] = stale_after
+            self._stale[slot] = 0
+            self._entities[slot] = entity
+        else:
+            slot = len(self._entities)
+            self._last_seen.append(now)
+            self._stale_after.append(stale_after)
+            self._stale.append(0)
+            self._entities.append(entity)
+        if self._timer is None:
+            self._timer = self.hass.loop.call_later(self.interval, self._async_scan)
+        return slot
+
+    @callback
+    def async_unregister(self, slot: int) -> None:
+        """Stop watching the entity of a slot."""
+        self._entities[slot] = None
+        self._stale[slot] = 0
+        self._free.append(slot)
+        if not len(self) and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @callback
+    def async_seen(self, slot: int) -> bool:
+        """Store that the entity of a slot got a message, return if it was stale."""
+        self._last_seen[slot] = self.hass.loop.time()
+        if self._stale[slot]:
+            self._stale[slot] = 0
+            return True
+        return False
+
+    def is_stale(self, slot: int) -> bool:
+        """Return if the entity of a slot went quiet."""
+        return bool(self._stale[slot])
+
+    @callback
+    def _async_scan(self) -> None:
+        """Mark the entities that went quiet since the last scan stale."""
+        self._timer = self.hass.loop.call_later(self.interval, self._async_scan)
+        now = self.hass.loop.time()
+        last_seen = self._last_seen
+        stale_after = self._stale_after
+        stale = self._stale
+        entities = self._entities
+        expired = [
+            slot
+            for slot in range(len(entities))
+            if not stale[slot]
+            and entities[slot] is not None
+            and now - last_seen[slot] > stale_after[slot]
+        ]
+        if not expired:
+            return
+        _LOGGER.debug("Marking %d quiet entities unavailable", len(expired))
+        for slot in expired:
+            stale[slot] = 1
+        for slot in expired:
+            entities[slot].async_write_ha_state()
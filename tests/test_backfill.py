@@ -0,0 +1,194 @@
+"""Tests for the backfill of the Flukso counter statistics."""
+from datetime import datetime
+
+import aiohttp
+import pytest
+from aiohttp import web
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.statistics import (
+    async_import_statistics, statistics_during_period)
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.components.recorder.common import \
+    async_wait_recording_done
+
+from custom_components.flukso.backfill import (_async_backfill_entity,
+                                               _get_hourly_weights)
+from custom_components.flukso.const import BACKFILL_MAX_GAP
+from custom_components.flukso.models import FluksoSensorConfig
+
+ENTITY_ID = "sensor.main_electricity_counter"
+SENSOR = FluksoSensorConfig.from_json(
+    {
+        "id": "b" * 32,
+        "enable": 1,
+        "class": "analog",
+        "type": "electricity",
+        "function": "main",
+        "port": [1],
+        "data_type": "counter",
+    }
+)
+
+
+@pytest.fixture
+def auto_enable_custom_integrations(recorder_mock, enable_custom_integrations):
+    """Set up the recorder before Home Assistant, as the recorder tests need."""
+    yield
+
+
+def _get_current_hour() -> float:
+    now = dt_util.utcnow().timestamp()
+    return now - now % 3600
+
+
+def _rate(hour: float, timestamp: float) -> int:
+    """Return the watts of the stand-in Flukso, 100 W and 300 W for two hours."""
+    return {hour - 3 * 3600: 100, hour - 2 * 3600: 300}.get(
+        timestamp - timestamp % 3600, 0
+    )
+
+
+@pytest.fixture
+async def flukso_host(aiohttp_server, socket_enabled):
+    """Start a stand-in for the local API of a Flukso, return its host."""
+    requests = []
+
+    async def sensor_readings(request: web.Request) -> web.Response:
+        requests.append(request)
+        hour = _get_current_hour()
+        now = int(dt_util.utcnow().timestamp())
+        # A reading is the average watts since the previous reading
+        readings = [
+            [timestamp, _rate(hour, timestamp - 900)]
+            for timestamp in range(int(hour - 3 * 3600), now, 900)
+        ]
+        readings.append([now, "nan"])
+        return web.json_response(readings)
+
+    app = web.Application()
+    app.router.add_get("/sensor/{sensor_id}", sensor_readings)
+    server = await aiohttp_server(app)
+    server.requests = requests
+    return server
+
+
+async def _async_import_last_statistics(hass, start: float, state: float) -> None:
+    async_import_statistics(
+        hass,
+        {
+            "has_mean": False,
+            "has_sum": True,
+            "name": None,
+            "source": "recorder",
+            "statistic_id": ENTITY_ID,
+            "unit_of_measurement": "Wh",
+        },
+        [
+            {
+                "start": datetime.fromtimestamp(start, dt_util.UTC),
+                "state": state,
+                "sum": 50.0,
+            }
+        ],
+    )
+    await async_wait_recording_done(hass)
+
+
+async def _async_get_statistics(hass, start: float) -> list[tuple[float, float, float]]:
+    statistics = await get_instance(hass).async_add_executor_job(
+        statistics_during_period,
+        hass,
+        datetime.fromtimestamp(start, dt_util.UTC),
+        None,
+        {ENTITY_ID},
+        "hour",
+        None,
+        {"state", "sum"},
+    )
+    return [
+        (row["start"], row["state"], row["sum"])
+        for row in statistics.get(ENTITY_ID, [])
+    ]
+
+
+async def _async_backfill(hass, host: str) -> int:
+    # The session of Home Assistant leaves its resolver thread behind
+    async with aiohttp.ClientSession() as session:
+        return await _async_backfill_entity(hass, session, host, ENTITY_ID, SENSOR)
+
+
+def test_hourly_weights() -> None:
+    """Test the hours are weighted by the energy of the readings in them."""
+    readings = [(0, 0.0), (1800, 100.0), (3600, 100.0), (5400, 300.0), (9000, 50.0)]
+    assert _get_hourly_weights(readings, 1800, 9000) == {
+        0: 180000.0,
+        3600: 720000.0,
+    }
+    # Readings before the start are left out
+    assert _get_hourly_weights(readings, 3600, 9000) == {3600: 720000.0}
+
+
+def test_hourly_weights_without_readings() -> None:
+    """Test the hours are weighted by their length without usable readings."""
+    assert _get_hourly_weights([], 1800, 9000) == {
+        0: 1800,
+        3600: 3600,
+        7200: 1800,
+    }
+    assert _get_hourly_weights([(0, 0.0), (3600, 0.0)], 0, 3600) == {0: 3600}
+
+
+async def test_backfill(hass, flukso_host) -> None:
+    """Test the increase of a counter is spread over the hours it was missing."""
+    hour = _get_current_hour()
+    await _async_import_last_statistics(hass, hour - 4 * 3600, 1000.0)
+    hass.states.async_set(ENTITY_ID, "1400", {"unit_of_measurement": "Wh"})
+
+    host = f"127.0.0.1:{flukso_host.port}"
+    assert await _async_backfill(hass, host) == 3
+    await async_wait_recording_done(hass)
+
+    assert flukso_host.requests[0].path == f"/sensor/{SENSOR.id}"
+    assert flukso_host.requests[0].query["unit"] == "watt"
+    assert await _async_get_statistics(hass, hour - 4 * 3600) == [
+        (hour - 4 * 3600, 1000.0, 50.0),
+        (hour - 3 * 3600, pytest.approx(1100.0), pytest.approx(150.0)),
+        (hour - 2 * 3600, pytest.approx(1400.0), pytest.approx(450.0)),
+        (hour - 3600, pytest.approx(1400.0), pytest.approx(450.0)),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("hours_ago", "last_state", "counter"),
+    [
+        # The counter was reset
+        (4, 1000.0, "900"),
+        # The gap is too long
+        (BACKFILL_MAX_GAP // 3600 + 2, 1000.0, "1400"),
+        # The counter has no value
+        (4, 1000.0, "unavailable"),
+        # The statistics are up to date
+        (1, 1000.0, "1400"),
+    ],
+)
+async def test_backfill_skipped(
+    hass, flukso_host, hours_ago: int, last_state: float, counter: str
+) -> None:
+    """Test nothing is imported when the missing hours cannot be backfilled."""
+    hour = _get_current_hour()
+    await _async_import_last_statistics(hass, hour - hours_ago * 3600, last_state)
+    hass.states.async_set(ENTITY_ID, counter, {"unit_of_measurement": "Wh"})
+
+    assert await _async_backfill(hass, f"127.0.0.1:{flukso_host.port}") == 0
+    await async_wait_recording_done(hass)
+
+    assert not flukso_host.requests
+    assert len(await _async_get_statistics(hass, hour - hours_ago * 3600)) == 1
+
+
+async def test_backfill_without_statistics(hass, flukso_host) -> None:
+    """Test a counter without statistics is left to the recorder."""
+    hass.states.async_set(ENTITY_ID, "1400", {"unit_of_measurement": "Wh"})
+
+    assert await _async_backfill(hass, f"127.0.0.1:{flukso_host.port}") == 0
+    assert not flukso_host.requests
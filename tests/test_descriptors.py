@@ -0,0 +1,56 @@
+"""Tests for building the Flukso entity configs."""
+import traceback
+
+import pytest
+import voluptuous as vol
+from homeassistant.components.mqtt.const import (CONF_OBJECT_ID, CONF_QOS,
+                                                 CONF_STATE_TOPIC)
+from homeassistant.const import CONF_NAME, CONF_UNIQUE_ID
+
+from custom_components.flukso.descriptors import (_report_invalid_config,
+                                                  _validate_config)
+
+SCHEMA = vol.Schema({vol.Required(CONF_QOS): int}, extra=vol.ALLOW_EXTRA)
+
+
+def _get_config(qos) -> dict:
+    return {
+        CONF_NAME: "Main",
+        CONF_OBJECT_ID: "main",
+        CONF_UNIQUE_ID: "main",
+        CONF_STATE_TOPIC: "/sensor/0/gauge",
+        CONF_QOS: qos,
+    }
+
+
+def test_validate_config() -> None:
+    """Test a valid config keeps its per-entity fields and gets the device."""
+    config = _get_config(0)
+    assert _validate_config("test", SCHEMA, config, {"name": "Flukso"}) == {
+        **config,
+        "device": {"name": "Flukso"},
+    }
+
+
+def test_validate_invalid_config() -> None:
+    """Test an invalid shape raises a fresh error every time it is validated."""
+    config = _get_config("zero")
+    raised = []
+    for _ in range(3):
+        with pytest.raises(vol.Invalid) as excinfo:
+            _validate_config("test", SCHEMA, config, {})
+        raised.append(excinfo.value)
+
+    assert raised[0] is not raised[1]
+    assert len({len(traceback.extract_tb(err.__traceback__)) for err in raised}) == 1
+    errors = []
+    _report_invalid_config(errors, "test", None, config, raised[-1])
+    assert errors == [
+        {
+            "platform": "test",
+            "sensor": None,
+            "data_type": None,
+            "path": [CONF_QOS],
+            "error": "expected int",
+        }
+    ]
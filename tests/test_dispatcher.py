@@ -0,0 +1,67 @@
+"""Tests for the Flukso sensor message dispatcher."""
+from homeassistant.core import callback
+from pytest_homeassistant_custom_component.common import async_fire_mqtt_message
+
+from custom_components.flukso.dispatcher import FluksoDispatcher
+
+SENSOR_ID = "b" * 32
+TOPIC = f"/sensor/{SENSOR_ID}/gauge"
+
+
+class MockEntity:
+    """Entity keeping the payloads the dispatcher hands over."""
+
+    def __init__(self) -> None:
+        """Initialize the entity."""
+        self.payloads = []
+
+    @callback
+    def async_handle_message(self, msg) -> None:
+        """Keep the payload of a message."""
+        self.payloads.append(msg.payload)
+
+
+async def test_retained_message_replayed(hass, mqtt_mock) -> None:
+    """Test an entity registering after the retained replay gets the message."""
+    dispatcher = FluksoDispatcher(hass)
+    await dispatcher.async_subscribe()
+    async_fire_mqtt_message(hass, TOPIC, "1700000000,100,W", retain=True)
+    await hass.async_block_till_done()
+    assert dispatcher.dropped == 1
+
+    entity = MockEntity()
+    unregister = dispatcher.async_register(SENSOR_ID, "gauge", entity)
+    await hass.async_block_till_done()
+    assert entity.payloads == ["1700000000,100,W"]
+
+    # Live messages replace the kept message
+    async_fire_mqtt_message(hass, TOPIC, "1700000010,200,W")
+    await hass.async_block_till_done()
+    assert entity.payloads == ["1700000000,100,W", "1700000010,200,W"]
+    later = MockEntity()
+    dispatcher.async_register(SENSOR_ID, "gauge", later)
+    await hass.async_block_till_done()
+    assert later.payloads == ["1700000010,200,W"]
+    assert entity.payloads == ["1700000000,100,W", "1700000010,200,W"]
+
+    # An entity that unregistered before the replay gets nothing
+    unregister()
+    removed = MockEntity()
+    dispatcher.async_register(SENSOR_ID, "gauge", removed)()
+    await hass.async_block_till_done()
+    assert removed.payloads == []
+    dispatcher.async_unsubscribe()
+
+
+async def test_live_message_not_replayed(hass, mqtt_mock) -> None:
+    """Test messages of sensors without a retained message are not kept."""
+    dispatcher = FluksoDispatcher(hass)
+    await dispatcher.async_subscribe()
+    async_fire_mqtt_message(hass, TOPIC, "1700000000,100,W")
+    await hass.async_block_till_done()
+
+    entity = MockEntity()
+    dispatcher.async_register(SENSOR_ID, "gauge", entity)
+    await hass.async_block_till_done()
+    assert entity.payloads == []
+    dispatcher.async_unsubscribe()